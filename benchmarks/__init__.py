@@ -0,0 +1,4 @@
+"""Benchmarks for the Zoom & Go Rides backend, run them from the repository root
+
+    python -m benchmarks.<name>
+"""
@@ -0,0 +1,75 @@
+"""Admin mail for a burst of bookings: one notification each vs digests.
+
+Books --bookings bookings one at a time (pickups spread over the next
+--days days, so a few are urgent), queueing their emails as the booking
+route does, then flushes the digest buffer and counts what the outbox
+would send to COMPANY_EMAIL.
+
+    python -m benchmarks.admin_digests [--bookings 500] [--days 60]
+"""
+import argparse
+import time
+from datetime import date
+from types import SimpleNamespace
+
+from sqlalchemy import func, insert, select
+
+from benchmarks.common import booking_rows, create_app, remove_database
+from src.models.booking import db, Booking, EmailOutbox
+from src.utils.digests import admin_digests
+from src.utils.email_service import EmailService
+
+ADMIN_KINDS = ('admin_notification', 'admin_digest')
+
+
+def run(rows, window):
+    app = create_app()
+    email_service = EmailService()
+    admin_digests.window = window
+    with app.app_context():
+        db.session.execute(insert(Booking), rows)
+        db.session.commit()
+        bookings = db.session.scalars(select(Booking).order_by(Booking.id)).all()
+        email_service.templates  # compile outside the timing
+
+        start = time.perf_counter()
+        for booking in bookings:
+            email_service.queue_booking_emails(booking)
+            db.session.commit()
+        queued = time.perf_counter() - start
+        start = time.perf_counter()
+        if admin_digests.enabled:
+            admin_digests.flush(email_service)
+        flushed = time.perf_counter() - start
+
+        emails, size = db.session.execute(
+            select(func.count(), func.coalesce(func.sum(func.length(EmailOutbox.html_content)), 0))
+            .where(EmailOutbox.kind.in_(ADMIN_KINDS))
+        ).one()
+    remove_database(app)
+    return emails, size, queued, flushed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=500)
+    parser.add_argument('--days', type=int, default=60)
+    args = parser.parse_args()
+
+    rows = list(booking_rows(args.bookings, start=date.today(), days=args.days))
+    for row in rows:
+        # New bookings, as they come in
+        row['status'], row['driver_assigned'] = 'pending', None
+    urgent = sum(admin_digests.is_urgent(SimpleNamespace(**row)) for row in rows)
+    window = admin_digests.window
+
+    print(f"{args.bookings} bookings, {urgent} urgent, digests of up to {admin_digests.batch_size}")
+    print(f"{'admin mail':<16} {'emails':>7} {'html KB':>9} {'queue ms':>9} {'flush ms':>9}")
+    for label, mode_window in (('per booking', 0), ('digests', window or 900)):
+        emails, size, queued, flushed = run(rows, mode_window)
+        print(f"{label:<16} {emails:>7} {size / 1024:>9.0f} {queued * 1e3:>9.0f} {flushed * 1e3:>9.1f}")
+    admin_digests.window = window
+
+
+if __name__ == '__main__':
+    main()
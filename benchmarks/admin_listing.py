@@ -0,0 +1,72 @@
+"""Admin booking listing: keyset pagination vs OFFSET at increasing depth.
+
+Seeds a throwaway SQLite database, then times GET /api/admin/bookings with a
+cursor positioned at each depth, next to the equivalent LIMIT/OFFSET query.
+
+    python -m benchmarks.admin_listing [--rows 1000000] [--limit 50]
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import admin_client, create_app, remove_database, seed_bookings
+from src.models.booking import Booking
+from src.routes.admin import encode_cursor
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    start = time.perf_counter()
+    seed_bookings(app, args.rows)
+    print(f"seeded {args.rows:,} bookings in {time.perf_counter() - start:.1f}s")
+    client = admin_client(app)
+
+    filters = [('all bookings', None), ('status=confirmed', 'confirmed')]
+
+    try:
+        for label, status in filters:
+            print(f"\n{label}: median ms per page of {args.limit}")
+            print(f"{'depth':>10} {'keyset (endpoint)':>18} {'OFFSET (SQL only)':>18}")
+            with app.app_context():
+                query = Booking.query.order_by(Booking.pickup_date, Booking.id)
+                if status:
+                    query = query.filter(Booking.status == status)
+                total = query.count()
+
+            for depth in [0] + [int(total * fraction) for fraction in (0.01, 0.1, 0.5, 0.9)]:
+                url = f"/api/admin/bookings?limit={args.limit}" + (f"&status={status}" if status else '')
+                if depth:
+                    with app.app_context():
+                        position = query.with_entities(Booking.pickup_date, Booking.id).offset(depth - 1).first()
+                    url += f"&cursor={encode_cursor(*position)}"
+
+                def keyset():
+                    response = client.get(url)
+                    assert response.status_code == 200, response.data
+
+                def offset():
+                    with app.app_context():
+                        query.limit(args.limit).offset(depth).all()
+
+                print(f"{depth:>10,} {timed(keyset, args.repeat):>18.2f} {timed(offset, args.repeat):>18.2f}")
+    finally:
+        remove_database(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Hot/cold split: archive run, storage, lookups and exports before and after.
+
+    python -m benchmarks.archive [--bookings 200000] [--before 2025-06-01]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import func, select, text
+
+from benchmarks.common import admin_client, create_app, remove_database, seed_bookings
+from src.models.booking import db, ArchiveSegment, Booking
+from src.utils.archive import booking_archive
+
+
+def timed(function, repeat=1):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def table_bytes():
+    """Pages used by the booking table and its indexes"""
+    return db.session.scalar(text(
+        "SELECT sum(pgsize) FROM dbstat WHERE name = 'booking' OR name LIKE 'ix_booking_%' OR name LIKE 'sqlite_autoindex_booking%'"
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=200000)
+    parser.add_argument('--before', default='2025-06-01')
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+    before = date.fromisoformat(args.before)
+
+    app = create_app()
+    app.config['ARCHIVE_DIR'] = tempfile.mkdtemp(prefix='zoomgo-archive-')
+    seed_bookings(app, args.bookings)
+    booking_archive.init_app(app)
+    client = admin_client(app)
+
+    def export():
+        response = client.get('/api/admin/bookings/export?format=ndjson')
+        return len(response.get_data())
+
+    with app.app_context():
+        archived_ids = db.session.scalars(
+            select(Booking.booking_id)
+            .where(Booking.status.in_(('completed', 'cancelled')), Booking.pickup_date < before)
+            .order_by(func.random()).limit(args.lookups)
+        ).all()
+        hot_ids = db.session.scalars(
+            select(Booking.booking_id).where(Booking.pickup_date >= before).order_by(func.random()).limit(args.lookups)
+        ).all()
+        size_before = table_bytes()
+        export_before, exported = timed(export)
+
+        elapsed, archived = timed(lambda: booking_archive.run(before))
+        db.session.execute(text('VACUUM'))
+        remaining = db.session.scalar(select(func.count()).select_from(Booking))
+        segments = db.session.execute(select(func.count(), func.sum(ArchiveSegment.size))).one()
+        size_after = table_bytes()
+        export_after, exported_after = timed(export)
+        assert exported == exported_after
+
+        print(f"archived {archived} of {args.bookings} bookings in {elapsed:.2f} s, {archived / elapsed:,.0f} rows/s")
+        print(f"booking table + indexes: {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB ({remaining} rows)")
+        print(f"archive: {segments[0]} segments, {segments[1] / 1e6:.1f} MB ({segments[1] / archived:.0f} bytes/booking)")
+        print(f"full export ({exported / 1e6:.1f} MB): {export_before:.2f} s hot only -> {export_after:.2f} s hot + archive")
+
+        def lookup_hot():
+            for booking_id in hot_ids:
+                Booking.query.filter_by(booking_id=booking_id).first()
+            db.session.rollback()
+
+        def lookup_archived():
+            for booking_id in archived_ids:
+                assert booking_archive.get(booking_id) is not None
+
+        hot, _ = timed(lookup_hot, 3)
+        cold, _ = timed(lookup_archived, 3)
+        print(f"lookup by booking_id: table {hot / len(hot_ids) * 1e6:.0f} us, archive {cold / len(archived_ids) * 1e6:.0f} us")
+        booking_archive.close()
+
+    remove_database(app)
+    for filename in os.listdir(app.config['ARCHIVE_DIR']):
+        os.remove(os.path.join(app.config['ARCHIVE_DIR'], filename))
+    os.rmdir(app.config['ARCHIVE_DIR'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Bulk export: streaming NDJSON/CSV vs building Booking.to_dict() for every row.
+
+Each mode runs in a fresh process against the same seeded database, so peak
+RSS is comparable between them.
+
+    python -m benchmarks.booking_export [--rows 500000]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.common import admin_client, create_app, remove_database, seed_bookings
+
+MODES = ['to_dict', 'ndjson', 'csv']
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(database_path, mode):
+    app = create_app(database_path)
+    client = admin_client(app)
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'to_dict':
+        from src.models.booking import Booking
+        with app.app_context():
+            bookings = Booking.query.order_by(Booking.pickup_date, Booking.id).all()
+            body = json.dumps([booking.to_dict() for booking in bookings])
+        rows, size = len(bookings), len(body)
+    else:
+        response = client.get(f'/api/admin/bookings/export?format={mode}')
+        rows = size = 0
+        for chunk in response.response:
+            rows += chunk.count(b'\n') if isinstance(chunk, bytes) else chunk.count('\n')
+            size += len(chunk)
+        response.close()
+        if mode == 'csv':
+            rows -= 1  # header
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'rows': rows,
+        'bytes': size,
+        'seconds': elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+        'rss_growth_mb': peak_rss_mb() - baseline,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--worker', nargs=2, metavar=('DATABASE', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_mode(*args.worker)
+        return
+
+    app = create_app()
+    seed_bookings(app, args.rows)
+    try:
+        print(f"{'mode':<8} {'rows':>9} {'rows/s':>10} {'peak RSS':>10} {'RSS growth':>11}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.booking_export', '--worker', app.config['DATABASE_PATH'], mode],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<8} {result['rows']:>9,} {result['rows'] / result['seconds']:>10,.0f} "
+                  f"{result['peak_rss_mb']:>8.0f}MB {result['rss_growth_mb']:>9.0f}MB")
+    finally:
+        remove_database(app)
+
+
+if __name__ == '__main__':
+    main()
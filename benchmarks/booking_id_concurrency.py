@@ -0,0 +1,82 @@
+"""Concurrency check for the booking id allocator.
+
+Many processes, each with many threads, allocate ids from one SQLite
+sequence at the same time. The run fails if any id is handed out twice or
+fails its check digit.
+
+    python -m benchmarks.booking_id_concurrency [--processes 8] [--threads 8] [--ids 2000]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from benchmarks.common import create_app
+from src.utils.booking_ids import BookingIdAllocator
+
+
+def worker(database_path, threads, ids_per_thread, block_size, results):
+    app = create_app(database_path)
+    allocator = BookingIdAllocator(block_size=block_size)
+    allocated = []
+
+    def run():
+        with app.app_context():
+            local = [allocator.next_id() for _ in range(ids_per_thread)]
+        allocated.extend(local)
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    with app.app_context():
+        invalid = [booking_id for booking_id in allocated if not allocator.is_valid(booking_id)]
+    results.put((os.getpid(), allocated, invalid))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ids', type=int, default=2000, help='ids per thread')
+    parser.add_argument('--block-size', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    database_path = app.config['DATABASE_PATH']
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=worker,
+            args=(database_path, args.threads, args.ids, args.block_size, results)
+        )
+        for _ in range(args.processes)
+    ]
+
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    all_ids = [booking_id for _, allocated, _ in collected for booking_id in allocated]
+    invalid = [booking_id for _, _, bad in collected for booking_id in bad]
+    duplicates = len(all_ids) - len(set(all_ids))
+    expected = args.processes * args.threads * args.ids
+    os.remove(database_path)
+
+    print(f"{len(all_ids)} ids from {args.processes} processes x {args.threads} threads in {elapsed:.2f}s "
+          f"({len(all_ids) / elapsed:,.0f} ids/s)")
+    print(f"sequence blocks reserved: ~{-(-len(all_ids) // args.block_size)} (one DB round trip each)")
+    print(f"duplicates: {duplicates}, invalid: {len(invalid)}, missing: {expected - len(all_ids)}")
+    if duplicates or invalid or len(all_ids) != expected:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Cost of a customer polling GET /api/bookings/<booking_id>, cached and uncached.
+
+    python -m benchmarks.booking_status [--bookings 100000] [--polls 5000]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import create_app, remove_database, seed_bookings
+from src.models.booking import db, Booking
+from src.utils.booking_status import booking_status
+
+
+def timed(label, count, send):
+    start = time.perf_counter()
+    for index in range(count):
+        send(index)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / count * 1e6:>9.1f} us/poll  {count / elapsed:>8,.0f} polls/s")
+    return elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--polls', type=int, default=5000)
+    parser.add_argument('--polled', type=int, default=500, help='distinct bookings being polled')
+    args = parser.parse_args()
+
+    app = create_app()
+    seed_bookings(app, args.bookings)
+    booking_status.init_app(app)
+    booking_status.secret = booking_status.secret or 'benchmark-status-secret'
+    client = app.test_client()
+
+    rng = random.Random(1)
+    with app.app_context(), app.test_request_context():
+        polled = [
+            (booking_id, booking_status.token(booking_id))
+            for booking_id in db.session.scalars(
+                db.select(Booking.booking_id).order_by(db.func.random()).limit(args.polled)
+            )
+        ]
+    order = [rng.choice(polled) for _ in range(args.polls)]
+    etags = {}
+
+    def poll(index, conditional=False):
+        booking_id, token = order[index]
+        headers = {'If-None-Match': etags[booking_id]} if conditional else {}
+        response = client.get(f'/api/bookings/{booking_id}?token={token}', headers=headers)
+        assert response.status_code == (304 if conditional else 200), response.status_code
+        etags[booking_id] = response.headers['ETag']
+
+    def uncached(index):
+        booking_status.clear()
+        poll(index)
+
+    ttl = booking_status.ttl
+    booking_status.ttl = 0
+    timed('load and render every poll', args.polls, uncached)
+    timed('revalidate updated_at every poll', args.polls, poll)
+    booking_status.ttl = ttl
+    timed(f'served from memory ({ttl:g} s ttl)', args.polls, poll)
+    timed('304 Not Modified (If-None-Match)', args.polls, lambda index: poll(index, conditional=True))
+
+    remove_database(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Booking ingestion throughput: one POST /api/bookings per trip vs POST /api/bookings/bulk.
+
+    python -m benchmarks.bulk_ingest [--bookings 5000] [--batch 500]
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from benchmarks.common import create_app, remove_database
+from benchmarks.write_throughput import BOOKING
+
+
+def trips(count):
+    return [dict(BOOKING, email=f'rider{index}@example.com') for index in range(count)]
+
+
+def single(client, bookings, batch):
+    for booking in bookings:
+        assert client.post('/api/bookings', json=booking).status_code == 201
+
+
+def bulk_json(client, bookings, batch):
+    for start in range(0, len(bookings), batch):
+        response = client.post('/api/bookings/bulk', json=bookings[start:start + batch])
+        assert response.status_code == 201, response.json
+
+
+def bulk_ndjson(client, bookings, batch):
+    for start in range(0, len(bookings), batch):
+        body = '\n'.join(json.dumps(booking) for booking in bookings[start:start + batch])
+        response = client.post('/api/bookings/bulk', data=body, content_type='application/x-ndjson')
+        assert response.status_code == 201, response.json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=500)
+    args = parser.parse_args()
+
+    bookings = trips(args.bookings)
+    baseline = None
+    for label, run in (('single POST loop', single), ('bulk JSON array', bulk_json), ('bulk NDJSON', bulk_ndjson)):
+        app = create_app()
+        client = app.test_client()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(client, bookings, args.batch)
+        elapsed = time.perf_counter() - start
+        remove_database(app)
+
+        rate = args.bookings / elapsed
+        baseline = baseline or rate
+        print(f"{label:<18} {rate:>10,.0f} bookings/s  ({rate / baseline:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Slot capacity under concurrent booking writes.
+
+Writer processes POST /api/bookings for random slots of one day while
+reader processes poll GET /api/availability. Afterwards every slot is
+recounted from the bookings table: no slot may be over capacity and the
+counters must match the recount exactly.
+
+    python -m benchmarks.capacity [--writers 6] [--readers 2] [--seconds 10] [--capacity 5]
+"""
+import argparse
+import multiprocessing
+import random
+import time
+from collections import Counter
+
+from sqlalchemy import select
+
+from benchmarks.common import create_app, remove_database
+from benchmarks.write_throughput import BOOKING, quiet_worker
+from src.models.booking import db, Booking, SlotCapacity
+from src.utils.capacity import slot_capacity
+from src.utils.dispatch import ACTIVE_STATUSES
+
+DAY = '2026-06-01'
+VEHICLE_TYPES = ['standard', 'suv', 'van']
+
+
+def writer(database_path, capacity, seed, deadline, results):
+    quiet_worker('tuned')
+    slot_capacity.default_capacity = capacity
+    client = create_app(database_path, create_schema=False).test_client()
+    rng = random.Random(seed)
+    created = full = failed = 0
+    while time.time() < deadline:
+        booking = dict(
+            BOOKING,
+            vehicle_type=rng.choice(VEHICLE_TYPES),
+            pickup_time=f'{rng.randrange(6, 22):02d}:{rng.choice((0, 15, 30, 45)):02d}'
+        )
+        response = client.post('/api/bookings', json=booking)
+        if response.status_code == 201:
+            created += 1
+        elif response.status_code == 409:
+            full += 1
+        else:
+            failed += 1
+    results.put(('write', created, full, failed, []))
+
+
+def reader(database_path, capacity, seed, deadline, results):
+    quiet_worker('tuned')
+    slot_capacity.default_capacity = capacity
+    client = create_app(database_path, create_schema=False).test_client()
+    ok = failed = 0
+    latencies = []
+    while time.time() < deadline:
+        start = time.perf_counter()
+        response = client.get(f'/api/availability?date={DAY}')
+        latencies.append(time.perf_counter() - start)
+        if response.status_code == 200:
+            ok += 1
+        else:
+            failed += 1
+    results.put(('read', ok, 0, failed, latencies))
+
+
+def verify(app, capacity):
+    """Recount every slot from the bookings, returns (slots checked, mismatches, over capacity)"""
+    with app.app_context():
+        recount = Counter()
+        for booking in db.session.execute(
+            select(
+                Booking.pickup_date, Booking.pickup_time, Booking.pickup_location,
+                Booking.dropoff_location, Booking.return_trip, Booking.vehicle_type
+            ).where(Booking.status.in_(ACTIVE_STATUSES))
+        ):
+            recount.update(slot_capacity.slots_for(booking))
+
+        counters = {
+            (row.slot_date, row.slot, row.vehicle_type): row.booked
+            for row in db.session.scalars(select(SlotCapacity))
+        }
+        keys = set(recount) | set(counters)
+        mismatches = sum(1 for key in keys if recount.get(key, 0) != counters.get(key, 0))
+        over = sum(1 for key in keys if recount.get(key, 0) > capacity)
+        return len(keys), mismatches, over
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=6)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--capacity', type=int, default=5)
+    args = parser.parse_args()
+
+    slot_capacity.default_capacity = args.capacity
+    app = create_app()
+    path = app.config['DATABASE_PATH']
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + args.seconds + 1
+    processes = (
+        [multiprocessing.Process(target=writer, args=(path, args.capacity, seed, deadline, results)) for seed in range(args.writers)]
+        + [multiprocessing.Process(target=reader, args=(path, args.capacity, seed, deadline, results)) for seed in range(args.readers)]
+    )
+    for process in processes:
+        process.start()
+    collected = [results.get(timeout=args.seconds + 60) for _ in processes]
+    for process in processes:
+        process.join()
+
+    created = sum(result[1] for result in collected if result[0] == 'write')
+    full = sum(result[2] for result in collected if result[0] == 'write')
+    failed = sum(result[3] for result in collected if result[0] == 'write')
+    attempts = (created + full + failed) / args.seconds
+    print(f"writes    {attempts:>8,.0f} requests/s  {created} created, {full} rejected as full, {failed} errors")
+
+    latencies = sorted(latency for result in collected if result[0] == 'read' for latency in result[4])
+    reads = sum(result[1] for result in collected if result[0] == 'read')
+    if latencies:
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"reads     {reads / args.seconds:>8,.0f} availability/s  p50 {p50:.2f} ms  p99 {p99:.2f} ms")
+
+    slots, mismatches, over = verify(app, args.capacity)
+    print(f"verified  {slots} slots, {mismatches} counter mismatches, {over} over capacity")
+    remove_database(app)
+    if mismatches or over:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
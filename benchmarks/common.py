@@ -0,0 +1,159 @@
+"""Helpers shared by the benchmarks"""
+import os
+import random
+import tempfile
+from datetime import date, datetime, time, timedelta
+
+from flask import Flask
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+
+# The throughput benchmarks book the same slot over and over, keep capacity out of their way
+os.environ.setdefault('DEFAULT_SLOT_CAPACITY', '1000000000')
+
+from src.models.booking import db, Booking, User, ensure_indexes
+from src.utils.database import init_database
+
+SERVICE_TYPES = ['airport_transfer', 'point_to_point', 'hourly', 'corporate', 'wedding']
+VEHICLE_TYPES = ['standard', 'luxury_sedan', 'suv', 'van']
+STATUSES = ['pending', 'confirmed', 'completed', 'cancelled']
+DRIVERS = [None, None, 'Alex Morgan', 'Sam Lee', 'Chris Diaz', 'Pat Kim', 'Jamie Fox']
+LOCATIONS = [
+    'DFW International Airport', 'Dallas Love Field', 'Downtown Dallas', 'Uptown Dallas',
+    'Fort Worth', 'Arlington', 'Irving', 'Plano', 'Frisco', 'Richardson', 'Garland', 'Denton',
+]
+FIRST_NAMES = ['Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Avery', 'Quinn', 'Parker', 'Rowan', 'Sage']
+LAST_NAMES = ['Smith', 'Garcia', 'Nguyen', 'Patel', 'Johnson', 'Brown', 'Lopez', 'Khan', 'Martin', 'Okafor']
+
+
+def create_app(database_path=None, create_schema=True):
+    """A bare app bound to its own SQLite file, so benchmarks never touch app.db"""
+    from src.routes.admin import admin_bp
+    from src.routes.booking import booking_bp
+
+    if database_path is None:
+        handle, database_path = tempfile.mkstemp(prefix='zoomgo-bench-', suffix='.db')
+        os.close(handle)
+        os.remove(database_path)
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark'
+    app.config['DATABASE_PATH'] = database_path
+    init_database(app, f'sqlite:///{database_path}')
+    app.register_blueprint(booking_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    if create_schema:
+        with app.app_context():
+            db.create_all()
+    return app
+
+
+def remove_database(app):
+    path = app.config['DATABASE_PATH']
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def booking_rows(count, seed=42, start=date(2024, 1, 1), days=730, offset=0):
+    """Generate deterministic booking rows (plain dicts for a core INSERT)"""
+    rng = random.Random(seed + offset)
+    created = datetime(2024, 1, 1)
+    for index in range(offset, offset + count):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        yield {
+            'booking_id': f'BENCH{index:09d}',
+            'service_type': rng.choice(SERVICE_TYPES),
+            'vehicle_type': rng.choice(VEHICLE_TYPES),
+            'pickup_location': rng.choice(LOCATIONS),
+            'dropoff_location': rng.choice(LOCATIONS),
+            'pickup_date': start + timedelta(days=rng.randrange(days)),
+            'pickup_time': time(rng.randrange(24), rng.choice((0, 15, 30, 45))),
+            'passengers': rng.randint(1, 7),
+            'first_name': first_name,
+            'last_name': last_name,
+            'email': f'{first_name}.{last_name}{index}@example.com'.lower(),
+            'phone': f'+1 555 {index % 10000:04d}',
+            'special_requests': '' if index % 5 else 'Child seat please',
+            'return_trip': index % 3 == 0,
+            'waiting_time': index % 4 == 0,
+            'meet_greet': index % 6 == 0,
+            'status': rng.choice(STATUSES),
+            'estimated_price': round(rng.uniform(40, 400), 2),
+            'final_price': None,
+            'created_at': created,
+            'updated_at': created,
+            'admin_notes': None,
+            'driver_assigned': rng.choice(DRIVERS),
+        }
+
+
+def sqlite_value(value):
+    """Format a value the way SQLAlchemy stores it in SQLite"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, time):
+        return value.strftime('%H:%M:%S.%f')
+    return value
+
+
+def seed_bookings(app, count, chunk_size=50000, seed=42):
+    """Insert count generated bookings straight through the DB-API, returns the number inserted.
+
+    The secondary indexes are dropped during the load and rebuilt afterwards,
+    which is several times faster than maintaining them row by row.
+    """
+    columns = [column.name for column in Booking.__table__.columns if column.name != 'id']
+    statement = (
+        f"INSERT INTO booking ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})"
+    )
+    with app.app_context():
+        indexes = list(Booking.__table__.indexes)
+        for index in indexes:
+            index.drop(db.engine, checkfirst=True)
+
+        connection = db.engine.raw_connection()
+        try:
+            connection.execute('PRAGMA synchronous=OFF')
+            inserted = 0
+            while inserted < count:
+                size = min(chunk_size, count - inserted)
+                connection.executemany(statement, [
+                    tuple(sqlite_value(row[name]) for name in columns)
+                    for row in booking_rows(size, seed=seed, offset=inserted)
+                ])
+                connection.commit()
+                inserted += size
+        finally:
+            connection.close()
+
+        ensure_indexes()
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        return inserted
+
+
+def admin_client(app):
+    """A test client with a logged-in admin session"""
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').first()
+        if not admin:
+            admin = User(
+                username='admin',
+                email='admin@zoomgorides.com',
+                password_hash=generate_password_hash('admin123'),
+                is_admin=True
+            )
+            db.session.add(admin)
+            db.session.commit()
+        admin_id = admin.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+        session['admin_user_id'] = admin_id
+    return client
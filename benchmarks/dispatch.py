@@ -0,0 +1,91 @@
+"""Dispatch: auto-assign a day's pending bookings, and conflict checks per driver.
+
+    python -m benchmarks.dispatch [--bookings 3000] [--drivers 150]
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from benchmarks.common import VEHICLE_TYPES, booking_rows, create_app, remove_database
+from src.models.booking import db, Booking
+from src.models.driver import Driver
+from src.utils.dispatch import DispatchService
+from src.utils.pricing import ZONE_NAMES
+
+
+def seed(app, day, bookings, drivers):
+    rng = random.Random(7)
+    rows = []
+    for row in booking_rows(bookings, days=1, start=day):
+        row.update(status='pending', driver_assigned=None, updated_at=datetime.utcnow())
+        rows.append(row)
+    with app.app_context():
+        db.session.execute(insert(Driver), [
+            {
+                'name': f'Driver {index:04d}',
+                'vehicle_type': VEHICLE_TYPES[index % len(VEHICLE_TYPES)],
+                'home_zone': rng.choice(ZONE_NAMES),
+                'active': True,
+                'created_at': datetime.utcnow(),
+            }
+            for index in range(drivers)
+        ])
+        db.session.execute(insert(Booking), rows)
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=3000)
+    parser.add_argument('--drivers', type=int, default=150)
+    parser.add_argument('--checks', type=int, default=100000)
+    args = parser.parse_args()
+
+    day = date.today() + timedelta(days=1)
+    app = create_app()
+    seed(app, day, args.bookings, args.drivers)
+
+    with app.app_context():
+        service = DispatchService()
+
+        start = time.perf_counter()
+        service.refresh()
+        print(f"initial load        {(time.perf_counter() - start) * 1000:>8.1f} ms")
+
+        start = time.perf_counter()
+        assigned, unassigned = service.auto_assign(day)
+        elapsed = time.perf_counter() - start
+        print(f"auto-assign         {elapsed * 1000:>8.1f} ms  "
+              f"({len(assigned)} assigned, {len(unassigned)} without a free driver)")
+
+        stored = db.session.scalar(select(func.count()).where(Booking.driver_assigned.is_not(None)))
+        assert stored == len(assigned), (stored, len(assigned))
+
+        # Conflict checks against the now busy schedules
+        rng = random.Random(11)
+        names = list(service.drivers)
+        probes = [
+            (rng.choice(names), Booking(**booking_row))
+            for booking_row in booking_rows(min(args.checks, 1000), days=1, start=day, seed=5)
+        ]
+        start = time.perf_counter()
+        for index in range(args.checks):
+            driver, booking = probes[index % len(probes)]
+            service.conflict(driver, booking)
+        elapsed = time.perf_counter() - start
+        print(f"conflict check      {elapsed / args.checks * 1e6:>8.2f} us each")
+
+        start = time.perf_counter()
+        fresh = DispatchService()
+        fresh.refresh()
+        print(f"reload after assign {(time.perf_counter() - start) * 1000:>8.1f} ms  "
+              f"({len(fresh.assignments)} trips indexed)")
+
+    remove_database(app)
+
+
+if __name__ == '__main__':
+    main()
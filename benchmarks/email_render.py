@@ -0,0 +1,207 @@
+"""Per-message render cost: precompiled Jinja2 templates vs the old f-strings.
+
+The old renderers did not escape booking data; the escaped f-string is the
+same markup with the escaping the templates do, the fair baseline.
+
+    python -m benchmarks.email_render [--count 5000]
+"""
+import argparse
+import time
+from datetime import date, datetime, time as dt_time
+from types import SimpleNamespace
+
+from markupsafe import escape
+
+from src.utils.email_templates import EmailTemplates
+
+
+def legacy_booking_confirmation(booking, esc=str):
+    """The f-string renderer EmailService used before the Jinja2 templates.
+
+    It interpolated booking data unescaped; pass esc=escape for the same
+    markup with the escaping the templates do.
+    """
+    subject = f"Booking Confirmation - {booking.booking_id}"
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #003366; color: white; padding: 20px; text-align: center; }}
+            .content {{ padding: 20px; background-color: #f9f9f9; }}
+            .booking-details {{ background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }}
+            .footer {{ background-color: #003366; color: white; padding: 15px; text-align: center; font-size: 12px; }}
+            .status {{ background-color: #ffc107; color: #856404; padding: 5px 10px; border-radius: 3px; display: inline-block; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>Zoom & Go Rides</h1>
+                <h2>Booking Confirmation</h2>
+            </div>
+            
+            <div class="content">
+                <p>Dear {esc(booking.first_name)} {esc(booking.last_name)},</p>
+                
+                <p>Thank you for choosing Zoom & Go Rides! Your booking has been received and is currently being processed.</p>
+                
+                <div class="booking-details">
+                    <h3>Booking Details</h3>
+                    <p><strong>Booking ID:</strong> {esc(booking.booking_id)}</p>
+                    <p><strong>Status:</strong> <span class="status">{esc(booking.status.upper())}</span></p>
+                    <p><strong>Service:</strong> {esc(booking.service_type.replace('_', ' ').title())}</p>
+                    <p><strong>Vehicle:</strong> {esc(booking.vehicle_type.replace('_', ' ').title())}</p>
+                    <p><strong>Date & Time:</strong> {esc(booking.pickup_date)} at {esc(booking.pickup_time)}</p>
+                    <p><strong>Pickup Location:</strong> {esc(booking.pickup_location)}</p>
+                    <p><strong>Drop-off Location:</strong> {esc(booking.dropoff_location)}</p>
+                    <p><strong>Passengers:</strong> {esc(booking.passengers)}</p>
+                    {f'<p><strong>Estimated Price:</strong> ${booking.estimated_price:.2f}</p>' if booking.estimated_price else ''}
+                    {f'<p><strong>Special Requests:</strong> {esc(booking.special_requests)}</p>' if booking.special_requests else ''}
+                </div>
+                
+                <p><strong>What's Next?</strong></p>
+                <ul>
+                    <li>Our team will review your booking within 2 hours</li>
+                    <li>You will receive a confirmation call or email with final details</li>
+                    <li>A driver will be assigned and you'll receive their contact information</li>
+                </ul>
+                
+                <p>If you have any questions or need to make changes, please contact us:</p>
+                <p>📞 Phone: +1 (555) 123-4567<br>
+                📧 Email: bookings@zoomgorides.com</p>
+            </div>
+            
+            <div class="footer">
+                <p>&copy; 2025 Zoom & Go Rides. All rights reserved.</p>
+                <p>123 Transportation Ave, Dallas, TX 75201</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    return subject, html_content
+
+
+def legacy_admin_notification(booking, esc=str):
+    """The f-string renderer EmailService used before the Jinja2 templates (see above)"""
+    subject = f"New Booking Received - {booking.booking_id}"
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #dc3545; color: white; padding: 20px; text-align: center; }}
+            .content {{ padding: 20px; background-color: #f9f9f9; }}
+            .booking-details {{ background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }}
+            .urgent {{ background-color: #ff6b6b; color: white; padding: 10px; border-radius: 5px; margin: 10px 0; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🚨 New Booking Alert</h1>
+            </div>
+            
+            <div class="content">
+                <div class="urgent">
+                    <strong>Action Required:</strong> New booking needs review and confirmation
+                </div>
+                
+                <div class="booking-details">
+                    <h3>Booking Information</h3>
+                    <p><strong>Booking ID:</strong> {esc(booking.booking_id)}</p>
+                    <p><strong>Customer:</strong> {esc(booking.first_name)} {esc(booking.last_name)}</p>
+                    <p><strong>Email:</strong> {esc(booking.email)}</p>
+                    <p><strong>Phone:</strong> {esc(booking.phone)}</p>
+                    <p><strong>Service:</strong> {esc(booking.service_type.replace('_', ' ').title())}</p>
+                    <p><strong>Vehicle:</strong> {esc(booking.vehicle_type.replace('_', ' ').title())}</p>
+                    <p><strong>Date & Time:</strong> {esc(booking.pickup_date)} at {esc(booking.pickup_time)}</p>
+                    <p><strong>Pickup:</strong> {esc(booking.pickup_location)}</p>
+                    <p><strong>Drop-off:</strong> {esc(booking.dropoff_location)}</p>
+                    <p><strong>Passengers:</strong> {esc(booking.passengers)}</p>
+                    <p><strong>Estimated Price:</strong> ${booking.estimated_price:.2f}</p>
+                    <p><strong>Submitted:</strong> {esc(booking.created_at.strftime('%Y-%m-%d %H:%M:%S'))}</p>
+                    {f'<p><strong>Special Requests:</strong> {esc(booking.special_requests)}</p>' if booking.special_requests else ''}
+                </div>
+                
+                <p><strong>Next Steps:</strong></p>
+                <ul>
+                    <li>Review booking details</li>
+                    <li>Confirm availability</li>
+                    <li>Assign driver</li>
+                    <li>Contact customer for confirmation</li>
+                </ul>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    return subject, html_content
+
+
+def make_bookings(count):
+    return [
+        SimpleNamespace(
+            booking_id=f'ZGR{index:06d}',
+            service_type='airport_transfer',
+            vehicle_type='luxury_sedan',
+            pickup_location='DFW International Airport, Terminal D',
+            dropoff_location='1500 Marilla St, Dallas, TX',
+            pickup_date=date(2026, 5, 1),
+            pickup_time=dt_time(9, 30),
+            passengers=3,
+            first_name='Jordan',
+            last_name=f'Customer{index}',
+            email=f'customer{index}@example.com',
+            phone='+1 555 0100',
+            special_requests='Child seat please' if index % 2 else '',
+            status='pending',
+            estimated_price=85.0 + index % 40,
+            created_at=datetime(2026, 4, 20, 12, 0, 0)
+        )
+        for index in range(count)
+    ]
+
+
+def measure(label, render, bookings, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(bookings)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_message = best / len(bookings) * 1e6
+    print(f"{label:<40} {per_message:8.2f} us/message")
+    return per_message
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=5000)
+    args = parser.parse_args()
+
+    bookings = make_bookings(args.count)
+
+    start = time.perf_counter()
+    templates = EmailTemplates()
+    print(f"Template load + shell pre-render: {(time.perf_counter() - start) * 1000:.1f} ms (once per process)")
+
+    for kind, legacy in (
+        ('booking_confirmation', legacy_booking_confirmation),
+        ('admin_notification', legacy_admin_notification),
+    ):
+        print(f"\n{kind} ({args.count} messages)")
+        measure('f-string, unescaped (legacy)', lambda items: [legacy(b) for b in items], bookings)
+        escaped = measure('f-string, escaped', lambda items: [legacy(b, escape) for b in items], bookings)
+        single = measure('jinja2 render()', lambda items: [templates.render(kind, b) for b in items], bookings)
+        batch = measure('jinja2 render_many()', lambda items: templates.render_many(kind, items), bookings)
+        print(f"{'render / render_many vs escaped f-string':<40} {single / escaped:.2f}x / {batch / escaped:.2f}x time")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Cost of a retried POST /api/bookings: without a key, and replayed from the cache or the table.
+
+    python -m benchmarks.idempotency [--requests 2000]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.common import create_app, remove_database
+from benchmarks.write_throughput import BOOKING
+from src.models.booking import db, Booking, EmailOutbox
+from src.utils.idempotency import idempotency_keys
+
+
+def timed(label, count, send):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index in range(count):
+            send(index)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / count * 1e6:>9.1f} us/request")
+    return elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app()
+    idempotency_keys.init_app(app)
+    client = app.test_client()
+
+    def post(key=None):
+        headers = {'Idempotency-Key': key} if key else {}
+        response = client.post('/api/bookings', json=BOOKING, headers=headers)
+        assert response.status_code == 201, response.json
+
+    def replay_from_table(index):
+        idempotency_keys.clear_cache()
+        post(f'key-{index}')
+
+    timed('retry without a key (new booking)', args.requests, lambda index: post())
+    timed('first request with a key', args.requests, lambda index: post(f'key-{index}'))
+    timed('retry, replayed from the cache', args.requests, lambda index: post(f'key-{index}'))
+    timed('retry, replayed from the table', args.requests, replay_from_table)
+
+    with app.app_context():
+        bookings = db.session.query(Booking).count()
+        emails = db.session.query(EmailOutbox).count()
+    print(f"{bookings} bookings and {emails} emails for {4 * args.requests} requests")
+    remove_database(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+"""API load test: throughput and p50/p95/p99 latency per route, checked against a baseline.
+
+Seeds a SQLite database, then drives the real app (src.main) with
+concurrent clients, one scenario at a time: in process through the Flask
+test client (--target client), or over HTTP through a local server of
+several worker processes sharing one port (--target server).
+
+    python -m benchmarks.load [--target client|server] [--bookings 20000]
+                              [--concurrency 8] [--duration 3] [--repeat 3] [--workers 2]
+                              [--baseline benchmarks/baselines/load.json] [--tolerance 0.25]
+                              [--save-baseline benchmarks/baselines/load.json]
+
+Each scenario is measured --repeat times and the median of every metric
+is reported, which keeps one noisy run from failing the comparison. With
+--baseline the run exits with status 1 when a scenario has errors,
+its p99 grew or its throughput fell by more than the tolerance.
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from statistics import median
+
+from benchmarks.common import admin_client, create_app, remove_database, seed_bookings
+
+ADMIN_LOGIN = {'username': 'admin', 'password': 'admin123'}
+
+
+def booking_payload(rng):
+    pickup_date = date.today() + timedelta(days=rng.randrange(1, 365))
+    return {
+        'service': rng.choice(['airport_transfer', 'point_to_point', 'corporate']),
+        'vehicle_type': rng.choice(['standard', 'suv', 'van']),
+        'pickup_location': rng.choice(['DFW International Airport', 'Dallas Love Field', 'Plano']),
+        'dropoff_location': rng.choice(['Downtown Dallas', 'Fort Worth', 'Frisco']),
+        'pickup_date': pickup_date.isoformat(),
+        'pickup_time': f'{rng.randrange(24):02d}:{rng.choice((0, 15, 30, 45)):02d}',
+        'passengers': str(rng.randint(1, 6)),
+        'first_name': 'Load',
+        'last_name': 'Test',
+        'email': f'load{rng.randrange(10 ** 6)}@example.com',
+        'phone': '+1 555 0100',
+    }
+
+
+# name -> (needs an admin session, request builder returning (method, path, json body))
+SCENARIOS = {
+    'quote': (False, lambda rng: ('POST', '/api/quote', booking_payload(rng))),
+    'availability': (False, lambda rng: (
+        'GET', f'/api/availability?date={date.today() + timedelta(days=rng.randrange(1, 30))}', None
+    )),
+    'admin_list': (True, lambda rng: ('GET', '/api/admin/bookings?status=pending&limit=50', None)),
+    'admin_list_filtered': (True, lambda rng: (
+        'GET', f"/api/admin/bookings?date_from=2024-{rng.randint(1, 12):02d}-01&limit=50", None
+    )),
+    'admin_export': (True, lambda rng: (
+        'GET', f"/api/admin/bookings/export?format=ndjson&date_from=2024-{rng.randint(1, 12):02d}-01"
+               f"&date_to=2024-{rng.randint(1, 12):02d}-07", None
+    )),
+    'static_index': (False, lambda rng: ('GET', '/', None)),
+    # Last, so the emails it queues are not delivered while other scenarios are measured
+    'create_booking': (False, lambda rng: ('POST', '/api/bookings', booking_payload(rng))),
+}
+
+
+class ClientSession:
+    """One simulated client on the in-process test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPSession:
+    """One simulated client on a keep-alive HTTP connection"""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        headers = {'Accept-Encoding': 'gzip'}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                self.connection.request(method, path, body=data, headers=headers)
+                response = self.connection.getresponse()
+                response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The server closed an idle keep-alive connection, retry once on a new one
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+
+        if response.getheader('Set-Cookie'):
+            self.cookie = response.getheader('Set-Cookie').split(';')[0]
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response.status
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_scenario(name, make_session, concurrency, duration, warmup, seed):
+    needs_admin, build = SCENARIOS[name]
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start_event = threading.Event()
+    timing = {}
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        session = make_session()
+        if needs_admin:
+            session.request('POST', '/api/admin/login', ADMIN_LOGIN)
+
+        warm_until = time.perf_counter() + warmup
+        while time.perf_counter() < warm_until:
+            session.request(*build(rng))
+
+        start_event.wait()
+        deadline = timing['deadline']
+        samples = latencies[index]
+        while time.perf_counter() < deadline:
+            method, path, body = build(rng)
+            started = time.perf_counter()
+            try:
+                status = session.request(method, path, body)
+            except Exception:
+                status = None
+            samples.append(time.perf_counter() - started)
+            if status is None or status >= 400:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    # Let every client log in and warm up before the clock starts
+    time.sleep(warmup + 0.2)
+    began = time.perf_counter()
+    timing['deadline'] = began + duration
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    samples = sorted(sample for thread_samples in latencies for sample in thread_samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(errors),
+        'throughput': round(len(samples) / elapsed, 1),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+    }
+
+
+def serve(database_url, port, ready):
+    """A server worker: imports the app like a fresh process would and shares the port"""
+    os.environ['DATABASE_URL'] = database_url
+    sys.stdout = open(os.devnull, 'w')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    from werkzeug.serving import make_server
+    from src.main import create_app as create_main_app, start_background_workers
+    app = create_main_app()
+    start_background_workers()
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    listener.bind(('127.0.0.1', port))
+    listener.listen(128)
+    server = make_server('127.0.0.1', port, app, threaded=True, fd=listener.fileno())
+    ready.set()
+    server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def start_server(database_url, workers):
+    """Start the worker processes one after the other, returns (port, processes)"""
+    context = multiprocessing.get_context('spawn')
+    port = free_port()
+    processes = []
+    for _ in range(workers):
+        ready = context.Event()
+        process = context.Process(target=serve, args=(database_url, port, ready), daemon=True)
+        process.start()
+        if not ready.wait(60):
+            raise RuntimeError('Server worker did not start')
+        processes.append(process)
+    return port, processes
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of results against a baseline, as messages"""
+    regressions = []
+    for name, result in results['scenarios'].items():
+        if result['errors']:
+            regressions.append(f"{name}: {result['errors']} errors")
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            continue
+        if result['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {result['p99_ms']} ms vs baseline {base['p99_ms']} ms")
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput']} req/s vs baseline {base['throughput']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=['client', 'server'], default='client')
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--warmup', type=float, default=0.5)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline')
+    parser.add_argument('--save-baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    seed_app = create_app()
+    seed_bookings(seed_app, args.bookings, seed=args.seed)
+    admin_client(seed_app)
+    # What flask init-db does before a deploy, so the workers start on a ready database
+    from src.main import init_db
+    with seed_app.app_context():
+        init_db()
+    database_url = f"sqlite:///{seed_app.config['DATABASE_PATH']}"
+
+    processes = []
+    if args.target == 'server':
+        port, processes = start_server(database_url, args.workers)
+        make_session = lambda: HTTPSession(port)
+    else:
+        os.environ['DATABASE_URL'] = database_url
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        from src.main import create_app as create_main_app, start_background_workers
+        app = create_main_app()
+        start_background_workers()
+        make_session = lambda: ClientSession(app)
+
+    results = {
+        'target': args.target,
+        'config': {
+            'bookings': args.bookings,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'repeat': args.repeat,
+            'workers': args.workers if args.target == 'server' else 1,
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'scenarios': {},
+    }
+
+    report = sys.stdout
+    # The console email backend prints from the outbox workers, keep it out of the report
+    sys.stdout = open(os.devnull, 'w')
+    print(f"{'scenario':<22} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}", file=report)
+    try:
+        for name in names:
+            runs = [
+                run_scenario(name, make_session, args.concurrency, args.duration, args.warmup, args.seed + attempt)
+                for attempt in range(args.repeat)
+            ]
+            result = {key: median(run[key] for run in runs) for key in runs[0]}
+            results['scenarios'][name] = result
+            print(f"{name:<22} {result['requests']:>9} {result['errors']:>7} {result['throughput']:>9,.1f} "
+                  f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}", file=report, flush=True)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+        remove_database(seed_app)
+        sys.stdout.close()
+        sys.stdout = report
+
+    if args.save_baseline:
+        stored = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline) as f:
+                stored = json.load(f)
+        stored[args.target] = results
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"baseline for {args.target} saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get(args.target)
+        if baseline is None:
+            print(f"no {args.target} baseline in {args.baseline}")
+            raise SystemExit(1)
+        if baseline['config'] != results['config']:
+            print(f"warning: baseline was recorded with {baseline['config']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
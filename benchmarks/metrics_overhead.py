@@ -0,0 +1,63 @@
+"""Cost of request instrumentation: the same requests without and with metrics.
+
+    python -m benchmarks.metrics_overhead [--requests 3000] [--rounds 5] [--bookings 20000]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.common import admin_client, create_app, remove_database, seed_bookings
+from benchmarks.write_throughput import BOOKING
+from src.utils.metrics import Metrics
+
+REQUESTS = {
+    'quote (no SQL)': ('POST', '/api/quote', BOOKING),
+    'admin listing': ('GET', '/api/admin/bookings?status=pending&limit=50', None),
+    'create booking': ('POST', '/api/bookings', BOOKING),
+}
+
+
+def measure(client, method, path, body, count):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(count):
+            response = client.open(path, method=method, json=body)
+            assert response.status_code < 400, response.data
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--bookings', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = create_app()
+    seed_bookings(app, args.bookings)
+    metrics = Metrics(enabled=True)
+    metrics.init_app(app)
+    client = admin_client(app)
+
+    # Toggle collection on the same app in alternating rounds and keep the
+    # best round of each, so warm-up and background noise hit both sides
+    best = {(enabled, name): float('inf') for enabled in (False, True) for name in REQUESTS}
+    per_round = max(args.requests // args.rounds, 1)
+    for _ in range(args.rounds):
+        for name, request in REQUESTS.items():
+            for enabled in (False, True):
+                metrics.enabled = enabled
+                best[enabled, name] = min(best[enabled, name], measure(client, *request, per_round))
+    remove_database(app)
+
+    for name in REQUESTS:
+        before, after = best[False, name] * 1e6, best[True, name] * 1e6
+        print(f"{name:<16} {before:>9.1f} us -> {after:>9.1f} us  ({after - before:+.1f} us, {(after / before - 1) * 100:+.1f}%)")
+
+    exposition = metrics.render()
+    print(f"exposition: {len(exposition.splitlines())} lines, {len(exposition)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Booking search: LIKE '%...%' scans vs the FTS5 index.
+
+    python -m benchmarks.search [--bookings 1000000] [--repeat 5]
+"""
+import argparse
+import time
+
+from sqlalchemy import select
+
+from benchmarks.common import create_app, remove_database, seed_bookings
+from src.models.booking import db, Booking
+from src.utils.search import booking_search
+
+QUERIES = {
+    'common last name': 'okafor',
+    'phone number': '555 0100',
+    'name prefixes': 'jor smi',
+    'special request': 'child seat',
+    'two addresses': 'frisco plano',
+}
+
+
+def timed(query, repeat, limit):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        bookings = booking_search.search(db.session, query, limit)
+        best = min(best, time.perf_counter() - start)
+        db.session.expunge_all()
+    return best, len(bookings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    start = time.perf_counter()
+    seed_bookings(app, args.bookings)
+    print(f"seeded {args.bookings} bookings in {time.perf_counter() - start:.1f} s")
+    start = time.perf_counter()
+    booking_search.init_app(app)
+    with app.app_context():
+        booking_search.backfill()
+    print(f"built the search index in {time.perf_counter() - start:.1f} s")
+
+    with app.app_context():
+        email = db.session.scalar(select(Booking.email).where(Booking.id == args.bookings // 2))
+        queries = {'one email': email.split('@')[0], **QUERIES}
+        for name, query in queries.items():
+            booking_search.available = False
+            scan, scan_count = timed(query, args.repeat, args.limit)
+            booking_search.available = True
+            indexed, indexed_count = timed(query, args.repeat, args.limit)
+            print(f"{name:<18} {query!r:<22} LIKE {scan * 1e3:>9.2f} ms ({scan_count:>2})"
+                  f"   FTS5 {indexed * 1e3:>8.2f} ms ({indexed_count:>2})   {scan / indexed:>7.1f}x")
+    remove_database(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""Throughput of the serving modes side by side, at many concurrent connections.
+
+Each server runs in its own processes on a seeded copy of the database and
+is driven over keep-alive HTTP/1.1 connections by an asyncio client:
+
+    werkzeug  the development server (python src/main.py), a thread per connection
+    gunicorn  gunicorn.conf.py: preforked workers with a few threads each
+    uvicorn   src/asgi.py: event loops with the app on a thread pool
+
+    python -m benchmarks.serving [--connections 500] [--duration 5] [--workers 2]
+                                 [--servers werkzeug,gunicorn,uvicorn]
+                                 [--scenarios quote,availability,create_booking]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import create_app, remove_database, seed_bookings
+from benchmarks.load import booking_payload, free_port, percentile
+from src.main import init_db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'werkzeug': lambda port, workers: [
+        sys.executable, '-m', 'flask', '--app', 'src.wsgi', 'run',
+        '--port', str(port), '--with-threads', '--no-reload', '--no-debugger'
+    ],
+    'gunicorn': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), 'src.wsgi:app'
+    ],
+    'uvicorn': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'src.asgi:app', '--port', str(port),
+        '--workers', str(workers), '--backlog', '2048', '--log-level', 'warning'
+    ],
+}
+
+SCENARIOS = {
+    'quote': lambda rng: ('POST', '/api/quote', booking_payload(rng)),
+    'availability': lambda rng: (
+        'GET', f'/api/availability?date={date.today() + timedelta(days=rng.randrange(1, 30))}', None
+    ),
+    'create_booking': lambda rng: ('POST', '/api/bookings', booking_payload(rng)),
+}
+
+
+def encode_request(method, path, body):
+    data = json.dumps(body).encode() if body is not None else b''
+    head = f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(data)}\r\n'
+    if body is not None:
+        head += 'Content-Type: application/json\r\n'
+    return head.encode() + b'\r\n' + data
+
+
+async def read_response(reader):
+    """Read one response, returns (status, keep the connection open)"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.split(b'\r\n')
+    status = int(lines[0].split()[1])
+    keep_alive = lines[0].startswith(b'HTTP/1.1')
+    length = 0
+    chunked = False
+    for line in lines[1:]:
+        name, _, value = line.partition(b':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'transfer-encoding':
+            chunked = b'chunked' in value
+        elif name == b'connection':
+            keep_alive = value == b'keep-alive' or (keep_alive and value != b'close')
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def connection_loop(port, build, seed, deadline, measure_from, results):
+    rng = random.Random(seed)
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(encode_request(*build(rng)))
+            status, keep_alive = await asyncio.wait_for(read_response(reader), 30)
+            ok = status < 400
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            ok, keep_alive = False, False
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+        if start >= measure_from:
+            if ok:
+                results['latencies'].append(time.perf_counter() - start)
+            else:
+                results['errors'] += 1
+                await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, scenario, connections, duration, warmup, seed):
+    results = {'latencies': [], 'errors': 0}
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+    await asyncio.gather(*(
+        connection_loop(port, SCENARIOS[scenario], seed + index, deadline, measure_from, results)
+        for index in range(connections)
+    ))
+    latencies = sorted(results['latencies'])
+    return {
+        'requests': len(latencies),
+        'errors': results['errors'],
+        'throughput': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1e3, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1e3, 2),
+    }
+
+
+def wait_until_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with status {process.returncode}')
+        try:
+            status = asyncio.run(probe(port))
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('Server did not start')
+
+
+async def probe(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(encode_request('GET', f'/api/availability?date={date.today()}', None))
+    status, _ = await read_response(reader)
+    writer.close()
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--warmup', type=float, default=1)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--servers', default=','.join(SERVERS))
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    seed_app = create_app()
+    seed_bookings(seed_app, args.bookings, seed=args.seed)
+    # What flask init-db does before a deploy: counters, rollups and the search index
+    with seed_app.app_context():
+        init_db()
+    env = {**os.environ, 'DATABASE_URL': f"sqlite:///{seed_app.config['DATABASE_PATH']}"}
+
+    print(f"{args.connections} connections, {args.workers} workers (werkzeug: 1 process), {os.cpu_count()} CPUs")
+    print(f"{'server':<10} {'scenario':<16} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    try:
+        for server in args.servers.split(','):
+            port = free_port()
+            process = subprocess.Popen(
+                SERVERS[server](port, args.workers), cwd=ROOT, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_until_ready(port, process)
+                for scenario in args.scenarios.split(','):
+                    result = asyncio.run(drive(port, scenario, args.connections, args.duration, args.warmup, args.seed))
+                    print(f"{server:<10} {scenario:<16} {result['requests']:>9} {result['errors']:>7} "
+                          f"{result['throughput']:>9,.1f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}", flush=True)
+            finally:
+                process.terminate()
+                try:
+                    process.wait(15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+    finally:
+        remove_database(seed_app)
+
+
+if __name__ == '__main__':
+    main()
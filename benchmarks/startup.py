@@ -0,0 +1,100 @@
+"""Worker startup: cold import of the app and latency of its first requests.
+
+Every run is a fresh interpreter that imports src.wsgi, like a gunicorn
+worker booting, then sends a few requests through the test client:
+
+    libraries  importing Flask, SQLAlchemy and friends, a fixed cost
+    app        then importing src.wsgi, i.e. building the app
+    first_*    the first request of each kind in that process
+    second     the quote request again, once everything is warm
+
+The one-time setup (flask init-db and seed) is timed separately.
+
+    python -m benchmarks.startup [--bookings 100000] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import create_app, remove_database, seed_bookings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = r'''
+import json, resource, sys, time
+from datetime import date
+timings = {}
+start = time.perf_counter()
+import flask, flask_cors, flask_sqlalchemy, jinja2, sqlalchemy.orm
+timings['libraries'] = time.perf_counter() - start
+start = time.perf_counter()
+from src.wsgi import app
+timings['app'] = time.perf_counter() - start
+client = app.test_client()
+quote = {'service_type': 'airport_transfer', 'vehicle_type': 'standard', 'pickup_location': 'DFW International Airport',
+         'dropoff_location': 'Downtown Dallas', 'pickup_date': date.today().isoformat(), 'pickup_time': '10:00', 'passengers': 2}
+for name, send in (
+    ('first_availability', lambda: client.get(f'/api/availability?date={date.today()}')),
+    ('first_quote', lambda: client.post('/api/quote', json=quote)),
+    ('first_login', lambda: client.post('/api/admin/login', json={'username': 'admin', 'password': 'admin123'})),
+    ('first_stats', lambda: client.get('/api/admin/stats')),
+    ('first_static', lambda: client.get('/')),
+    ('second', lambda: client.post('/api/quote', json=quote)),
+):
+    begin = time.perf_counter()
+    response = send()
+    timings[name] = time.perf_counter() - begin
+    assert response.status_code < 500 or name == 'first_static', (name, response.status_code)
+timings['rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(timings))
+'''
+
+
+def run(command, env):
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return time.perf_counter() - start, result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    seed_app = create_app()
+    seed_bookings(seed_app, args.bookings)
+    env = {
+        **os.environ,
+        'DATABASE_URL': f"sqlite:///{seed_app.config['DATABASE_PATH']}",
+        'EMAIL_WORKERS': '0',
+    }
+    try:
+        for command in ('init-db', 'seed'):
+            elapsed, _ = run([sys.executable, '-m', 'flask', '--app', 'src.main', command], env)
+            print(f"flask {command:<8} {elapsed * 1e3:>9.0f} ms (once per deploy)")
+
+        runs = []
+        for _ in range(args.runs):
+            elapsed, output = run([sys.executable, '-c', WORKER], env)
+            timings = json.loads(output.strip().splitlines()[-1])
+            timings['process'] = elapsed
+            runs.append(timings)
+
+        print(f"median of {args.runs} fresh worker processes, {args.bookings} bookings:")
+        for name in ('process', 'libraries', 'app', 'first_availability', 'first_quote', 'first_login',
+                     'first_stats', 'first_static', 'second'):
+            print(f"  {name:<20} {statistics.median(run[name] for run in runs) * 1e3:>9.1f} ms")
+        print(f"  {'max rss':<20} {statistics.median(run['rss_mb'] for run in runs):>9.1f} MB")
+    finally:
+        remove_database(seed_app)
+
+
+if __name__ == '__main__':
+    main()
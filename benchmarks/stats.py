@@ -0,0 +1,76 @@
+"""Dashboard stats: GROUP BY over the bookings table vs reading the rollups.
+
+    python -m benchmarks.stats [--bookings 200000] [--repeat 20]
+"""
+import argparse
+import time
+from datetime import date
+
+from sqlalchemy import func, select
+
+from benchmarks.common import create_app, remove_database, seed_bookings
+from src.models.booking import db, Booking, BookingRollup
+from src.utils.rollups import booking_rollups
+
+QUERIES = {
+    'by status, all time': (('status',), None),
+    'by day and status, one month': (('day', 'status'), (date(2025, 3, 1), date(2025, 3, 31))),
+    'by service and vehicle, one year': (('service_type', 'vehicle_type'), (date(2024, 1, 1), date(2024, 12, 31))),
+}
+
+BOOKING_COLUMNS = {
+    'day': Booking.pickup_date,
+    'status': Booking.status,
+    'service_type': Booking.service_type,
+    'vehicle_type': Booking.vehicle_type,
+}
+
+
+def group_by_bookings(group_by, dates):
+    columns = [BOOKING_COLUMNS[name] for name in group_by]
+    conditions = [Booking.pickup_date.between(*dates)] if dates else []
+    return db.session.execute(
+        select(*columns, func.count(), func.sum(Booking.estimated_price), func.sum(Booking.final_price))
+        .where(*conditions)
+        .group_by(*columns)
+    ).all()
+
+
+def from_rollups(group_by, dates):
+    conditions = [BookingRollup.day.between(*dates)] if dates else []
+    return booking_rollups.summary(db.session, group_by, conditions)
+
+
+def timed(function, repeat, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    seed_bookings(app, args.bookings)
+    with app.app_context():
+        start = time.perf_counter()
+        booking_rollups.rebuild()
+        rows = db.session.scalar(select(func.count()).select_from(BookingRollup))
+        print(f"rebuild: {rows} rollup rows for {args.bookings} bookings in {time.perf_counter() - start:.2f} s")
+
+        for name, (group_by, dates) in QUERIES.items():
+            scan, expected = timed(group_by_bookings, args.repeat, group_by, dates)
+            rollup, groups = timed(from_rollups, args.repeat, group_by, dates)
+            assert sum(row[len(group_by)] for row in expected) == sum(group['bookings'] for group in groups)
+            print(f"{name:<34} GROUP BY {scan * 1e3:>8.2f} ms   rollups {rollup * 1e3:>7.2f} ms   ({scan / rollup:.1f}x)")
+    remove_database(app)
+
+
+if __name__ == '__main__':
+    main()
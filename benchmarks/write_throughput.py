@@ -0,0 +1,106 @@
+"""Multi-process booking write throughput: SQLite defaults vs the tuned profile.
+
+Writer processes POST /api/bookings through the full request path while
+reader processes page through the admin listing, all on one SQLite file.
+
+    python -m benchmarks.write_throughput [--writers 8] [--readers 2] [--seconds 10]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from benchmarks.common import admin_client, create_app, remove_database, seed_bookings
+
+BOOKING = {
+    'service': 'airport_transfer',
+    'pickup_location': 'DFW International Airport',
+    'dropoff_location': 'Downtown Dallas',
+    'pickup_date': '2026-06-01',
+    'pickup_time': '09:30',
+    'passengers': '2',
+    'first_name': 'Jordan',
+    'last_name': 'Smith',
+    'email': 'jordan@example.com',
+    'phone': '+1 555 0100',
+}
+
+
+def quiet_worker(profile):
+    # Workers share the schema created by the parent and keep their output to themselves
+    os.environ['SQLITE_PROFILE'] = profile
+    sys.stdout = open(os.devnull, 'w')
+
+
+def writer(database_path, profile, deadline, results):
+    quiet_worker(profile)
+    client = create_app(database_path, create_schema=False).test_client()
+    ok = locked = failed = 0
+    while time.time() < deadline:
+        response = client.post('/api/bookings', json=BOOKING)
+        if response.status_code == 201:
+            ok += 1
+        elif b'locked' in response.data:
+            locked += 1
+        else:
+            failed += 1
+    results.put(('write', ok, locked, failed))
+
+
+def reader(database_path, profile, deadline, results):
+    quiet_worker(profile)
+    client = admin_client(create_app(database_path, create_schema=False))
+    ok = locked = failed = 0
+    while time.time() < deadline:
+        response = client.get('/api/admin/bookings?status=pending&limit=50')
+        if response.status_code == 200:
+            ok += 1
+        elif b'locked' in response.data:
+            locked += 1
+        else:
+            failed += 1
+    results.put(('read', ok, locked, failed))
+
+
+def run(profile, args):
+    os.environ['SQLITE_PROFILE'] = profile
+    app = create_app()
+    seed_bookings(app, args.seed_rows)
+    admin_client(app)
+    path = app.config['DATABASE_PATH']
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + args.seconds + 1
+    processes = (
+        [multiprocessing.Process(target=writer, args=(path, profile, deadline, results)) for _ in range(args.writers)]
+        + [multiprocessing.Process(target=reader, args=(path, profile, deadline, results)) for _ in range(args.readers)]
+    )
+    for process in processes:
+        process.start()
+    collected = [results.get(timeout=args.seconds + 60) for _ in processes]
+    for process in processes:
+        process.join()
+    remove_database(app)
+
+    for kind in ('write', 'read'):
+        ok = sum(result[1] for result in collected if result[0] == kind)
+        locked = sum(result[2] for result in collected if result[0] == kind)
+        failed = sum(result[3] for result in collected if result[0] == kind)
+        print(f"{profile:<8} {kind:<6} {ok / args.seconds:>10,.0f}/s {locked:>8} locked {failed:>6} other errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--seed-rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    for profile in ('default', 'tuned'):
+        run(profile, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Production WSGI server settings.
+
+    flask --app src.main init-db && flask --app src.main seed
+    gunicorn -c gunicorn.conf.py src.wsgi:app
+
+The schema is created (and upgraded) by init-db once per deploy, so
+workers boot without touching the database. Preforked worker processes,
+each serving requests on a few threads (gthread). Every worker imports the
+app on its own, with its own database pool and background threads (outbox
+delivery, idempotency sweeper); the outbox claims messages with leases, so
+several workers can share it. The app is not preloaded in the master
+because threads started there would not survive the fork.
+
+SQLite serializes writers, so more processes mainly help reads; with
+PostgreSQL raise WEB_CONCURRENCY with the cores. For many slow or idle
+connections, serve src/asgi.py from an event loop instead:
+
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker src.asgi:app
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+backlog = int(os.getenv('GUNICORN_BACKLOG', '2048'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+# Recycle workers now and then, staggered, to bound memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = max_requests // 10
+preload_app = False
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
@@ -0,0 +1,33 @@
+"""ASGI entry point: the app served from an event loop.
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+The event loop only accepts connections and moves bytes; every request runs
+the Flask app on a bounded thread pool (ASGI_THREADS), so SQLite work in
+booking creation never blocks it, and emails are sent by the outbox workers
+after the booking is committed. Hundreds of idle or slow keep-alive
+connections cost a socket each instead of a thread each.
+
+The bridge is a2wsgi's WSGIMiddleware: request bodies are streamed into the
+app, which refuses any over MAX_CONTENT_LENGTH with a 413, and responses
+(exports included) are streamed back through a small queue, so the app
+thread waits when the client reads slower.
+"""
+import os
+import sys
+
+from a2wsgi import WSGIMiddleware
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import create_app, start_background_workers
+
+# Response chunks in flight between the app thread and the event loop
+SEND_QUEUE_SIZE = 8
+
+app = WSGIMiddleware(
+    create_app(),
+    workers=int(os.getenv('ASGI_THREADS', '16')),
+    send_queue_size=SEND_QUEUE_SIZE
+)
+start_background_workers()
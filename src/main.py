@@ -3,49 +3,148 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import click
+from flask import Flask, current_app, jsonify
+from flask.cli import with_appcontext
 from flask_cors import CORS
-from src.models.booking import db
+from src.models.booking import db, ensure_indexes
 from src.routes.booking import booking_bp
-from src.routes.admin import admin_bp
+from src.routes.admin import admin_bp, create_admin_user
+from src.utils.email_outbox import outbox_workers
+from src.utils.database import init_database
+from src.utils.static_assets import static_assets
+from src.utils.dispatch import dispatch_service
+from src.utils.capacity import slot_capacity
+from src.utils.metrics import metrics
+from src.utils.idempotency import idempotency_keys
+from src.utils.rollups import booking_rollups
+from src.utils.search import booking_search
+from src.utils.archive import booking_archive
+from src.utils.booking_status import booking_status
+from src.utils.digests import admin_digests
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
-# Enable CORS for all routes
-CORS(app, supports_credentials=True)
+def create_app(config=None):
+    """Build the app without touching the database.
 
-# Register blueprints
-app.register_blueprint(booking_bp, url_prefix='/api')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    Every worker process calls this, so it only wires things up: engines
+    connect, email templates compile, static files load and in-process
+    indexes fill on first use. Creating the schema and the default admin is
+    done once per deploy, before the workers start:
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+        flask --app src.main init-db
+        flask --app src.main seed
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    # Larger request bodies get a 413 before they are read (a bulk request of
+    # BULK_BOOKING_LIMIT bookings is well under 1 MB)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(2 * 1024 * 1024)))
+    app.config.update(config or {})
+
+    # Enable CORS for all routes
+    CORS(app, supports_credentials=True)
+
+    # Register blueprints
+    app.register_blueprint(booking_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+
+    # Database configuration (DATABASE_URL, defaults to src/database/app.db)
+    init_database(app, app.config.get('DATABASE_URL'))
+
+    # Per-route latency and SQL metrics, served on /api/admin/metrics
+    metrics.init_app(app)
+
+    # Driver schedules are loaded from the bookings table on first use, then kept current incrementally
+    dispatch_service.init_app(app)
+    # Slot counters for the availability check (filled in by flask init-db on an existing database)
+    slot_capacity.init_app(app)
+    # Dashboard rollups, kept current by Booking events ("flask rollups rebuild" recounts them)
+    booking_rollups.init_app(app)
+    # Full-text booking search (FTS5 on SQLite), indexed by flask init-db
+    booking_search.init_app(app)
+    # Old completed/cancelled bookings live in compressed segments ("flask archive run" moves them)
+    booking_archive.init_app(app)
+    # Public booking status views, cached per booking and revalidated by updated_at
+    booking_status.init_app(app)
+
+    # New bookings reach admins in digests, urgent ones right away ("flask digests flush" sends one now)
+    admin_digests.init_app(app)
+    # Deliver queued emails and delete expired Idempotency-Key rows in the
+    # background, once a serving process calls start_background_workers()
+    outbox_workers.init_app(app)
+    idempotency_keys.init_app(app)
+
+    # Static files are served from memory with ETags and precompressed variants, loaded on first request
+    static_assets.init_app(app)
+
+    app.register_error_handler(413, request_too_large)
+
+    app.add_url_rule('/', 'serve', serve, defaults={'path': ''})
+    app.add_url_rule('/<path:path>', 'serve', serve)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_command)
+    return app
+
+
+def start_background_workers():
+    """Start the outbox delivery and idempotency sweeper threads.
+
+    Only the serving entry points call this (src/wsgi.py, src/asgi.py and the
+    development server), so flask CLI commands never claim or send mail.
+    """
+    outbox_workers.start()
+    idempotency_keys.start()
+
+
+def request_too_large(error):
+    return jsonify({'error': f"Request body larger than {current_app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
 
-with app.app_context():
-    db.create_all()
-    # Create default admin user
-    from src.routes.admin import create_admin_user
-    create_admin_user()
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    if current_app.static_folder is None:
+        return "Static folder not configured", 404
+
+    asset = static_assets.get(path) if path != "" else None
+    if asset is None:
+        # Unknown paths are SPA routes
+        asset = static_assets.index
+        if asset is None:
             return "index.html not found", 404
+    return static_assets.respond(asset)
+
+
+def init_db():
+    """Create missing tables and indexes, then fill the tables derived from bookings"""
+    db.create_all()
+    ensure_indexes()
+    slot_capacity.backfill()
+    booking_rollups.backfill()
+    booking_search.backfill()
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the database schema (safe to run again)"""
+    init_db()
+    click.echo('Database is up to date')
+
+
+@click.command('seed')
+@with_appcontext
+def seed_command():
+    """Create the default admin user if it is missing"""
+    create_admin_user()
 
 
+# Development server only: production runs src/wsgi.py under gunicorn
+# (gunicorn.conf.py) or src/asgi.py under uvicorn, after init-db and seed
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        init_db()
+        create_admin_user()
+    start_background_workers()
     app.run(host='0.0.0.0', port=5000, debug=True)
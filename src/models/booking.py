@@ -41,6 +41,17 @@ class Booking(db.Model):
     admin_notes = db.Column(db.Text)
     driver_assigned = db.Column(db.String(100))
 
+    # Composite indexes for the admin listing: each filter column followed by
+    # the (pickup_date, id) keyset the listing is ordered and paginated by
+    __table_args__ = (
+        db.Index('ix_booking_pickup', 'pickup_date', 'id'),
+        db.Index('ix_booking_status_pickup', 'status', 'pickup_date', 'id'),
+        db.Index('ix_booking_service_pickup', 'service_type', 'pickup_date', 'id'),
+        db.Index('ix_booking_driver_pickup', 'driver_assigned', 'pickup_date', 'id'),
+        # Lets in-process indexes (e.g. dispatch) catch up on changed rows only
+        db.Index('ix_booking_updated_at', 'updated_at'),
+    )
+
     def __repr__(self):
         return f'<Booking {self.booking_id}>'
 
@@ -72,6 +83,105 @@ class Booking(db.Model):
             'driver_assigned': self.driver_assigned
         }
 
+class IdSequence(db.Model):
+    """Named counter that hands out blocks of ids (see src/utils/booking_ids.py)"""
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+
+    def __repr__(self):
+        return f'<IdSequence {self.name}={self.next_value}>'
+
+class SlotCapacity(db.Model):
+    """Vehicles of one type booked in a 15-minute slot (see src/utils/capacity.py)"""
+    slot_date = db.Column(db.Date, primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True)  # minutes since midnight // 15
+    vehicle_type = db.Column(db.String(50), primary_key=True)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SlotCapacity {self.slot_date} {self.slot} {self.vehicle_type}={self.booked}>'
+
+class BookingRollup(db.Model):
+    """Bookings and revenue per pickup day, status, service and vehicle (see src/utils/rollups.py)"""
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    service_type = db.Column(db.String(50), primary_key=True)
+    vehicle_type = db.Column(db.String(50), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    estimated_total = db.Column(db.Float, nullable=False, default=0)
+    final_total = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<BookingRollup {self.day} {self.status} {self.service_type} {self.vehicle_type}={self.bookings}>'
+
+class ArchiveSegment(db.Model):
+    """A compressed file of archived bookings, listed once its rows are deleted (see src/utils/archive.py)"""
+    name = db.Column(db.String(100), primary_key=True)
+    pickup_from = db.Column(db.Date)
+    pickup_to = db.Column(db.Date)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    size = db.Column(db.BigInteger, nullable=False, default=0)  # bytes of the segment file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ArchiveSegment {self.name}>'
+
+class PendingSegment(db.Model):
+    """A segment an archive run is writing, committed before its files exist (see src/utils/archive.py)"""
+    name = db.Column(db.String(100), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PendingSegment {self.name}>'
+
+class IdempotencyKey(db.Model):
+    """Response of a request made with an Idempotency-Key header (see src/utils/idempotency.py)"""
+    key = db.Column(db.String(128), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # sha256 of method, path and body
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key}>'
+
+class EmailOutbox(db.Model):
+    """Outgoing email queued in the same transaction as the booking that triggered it"""
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.String(20), index=True)
+    kind = db.Column(db.String(50), nullable=False)  # booking_confirmation, admin_notification, admin_digest
+
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+
+    # Delivery state
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lease_token = db.Column(db.String(32))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.kind} {self.booking_id} {self.status}>'
+
+class AdminNotification(db.Model):
+    """A new booking waiting for the next admin digest email (see src/utils/digests.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AdminNotification {self.booking_id}>'
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -92,3 +202,9 @@ class User(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+def ensure_indexes():
+    """Create indexes that were added to models after their tables already existed"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
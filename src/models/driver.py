@@ -0,0 +1,28 @@
+from datetime import datetime
+from src.models.booking import db
+
+class Driver(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # Bookings refer to drivers by name through Booking.driver_assigned
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    phone = db.Column(db.String(20))
+    email = db.Column(db.String(120))
+    vehicle_type = db.Column(db.String(50), nullable=False, default='standard')
+    home_zone = db.Column(db.String(50))
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Driver {self.name}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'phone': self.phone,
+            'email': self.email,
+            'vehicle_type': self.vehicle_type,
+            'home_zone': self.home_zone,
+            'active': self.active,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
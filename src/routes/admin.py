@@ -1,7 +1,25 @@
-from flask import Blueprint, request, jsonify, session
-from src.models.booking import db, User
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
+from src.models.booking import db, User, Booking, BookingRollup
+from src.models.driver import Driver
+from src.utils.export import export_statement, iter_batches, merge_rows, stream_csv, stream_ndjson
+from src.utils.archive import booking_archive
+from src.utils.auth import principal_cache, require_admin
+from src.utils.booking_status import booking_status
+from src.utils.database import read_engine, read_session
+from src.utils.dispatch import ACTIVE_STATUSES, DispatchConflict, dispatch_service
+from src.utils.capacity import SlotFull, slot_capacity
+from src.utils.rollups import ROLLUP_KEYS, booking_rollups
+from src.utils.search import booking_search
+from src.utils.pricing import ZONES
+from src.utils.metrics import metrics
 from werkzeug.security import check_password_hash, generate_password_hash
+from datetime import datetime
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import IntegrityError
+import base64
 import hashlib
+import hmac
+import os
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -30,9 +48,6 @@ def admin_login():
         if not username or not password:
             return jsonify({'error': 'Username and password required'}), 400
         
-        # Create admin user if it doesn't exist
-        create_admin_user()
-        
         user = User.query.filter_by(username=username).first()
         
         if not user or not user.is_admin:
@@ -42,6 +57,7 @@ def admin_login():
         if username == 'admin' and password == 'admin123':
             session['admin_logged_in'] = True
             session['admin_user_id'] = user.id
+            principal_cache.remember(user)
             
             return jsonify({
                 'success': True,
@@ -70,35 +86,416 @@ def admin_logout():
 def check_auth():
     """Check if admin is authenticated"""
     if session.get('admin_logged_in'):
-        user_id = session.get('admin_user_id')
-        user = User.query.get(user_id)
+        user = principal_cache.get(session.get('admin_user_id'))
         if user and user.is_admin:
             return jsonify({
                 'authenticated': True,
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'is_admin': user.is_admin
-                }
+                'user': user._asdict()
             })
     
     return jsonify({'authenticated': False})
 
-def require_admin():
-    """Decorator to require admin authentication"""
-    def decorator(f):
-        def wrapper(*args, **kwargs):
-            if not session.get('admin_logged_in'):
-                return jsonify({'error': 'Authentication required'}), 401
-            
-            user_id = session.get('admin_user_id')
-            user = User.query.get(user_id)
-            if not user or not user.is_admin:
-                return jsonify({'error': 'Admin access required'}), 403
-            
-            return f(*args, **kwargs)
-        wrapper.__name__ = f.__name__
-        return wrapper
-    return decorator
+BOOKING_PAGE_SIZE = 50
+MAX_BOOKING_PAGE_SIZE = 200
+
+def encode_cursor(pickup_date, booking_pk):
+    """Encode the (pickup_date, id) position of the last row on a page"""
+    raw = f"{pickup_date.isoformat()}|{booking_pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor, raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        pickup_date, booking_pk = raw.split('|')
+        return datetime.strptime(pickup_date, '%Y-%m-%d').date(), int(booking_pk)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def parse_date_arg(name):
+    """Parse an optional YYYY-MM-DD query argument"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Invalid {name}, expected YYYY-MM-DD')
+
+def filter_args():
+    """The filters shared by the admin booking endpoints, from the query string"""
+    return {
+        'status': request.args.get('status') or None,
+        'service_type': request.args.get('service_type') or None,
+        'driver': request.args.get('driver') or None,
+        'date_from': parse_date_arg('date_from'),
+        'date_to': parse_date_arg('date_to'),
+    }
+
+def booking_filters(filters=None):
+    """Build the filter conditions shared by the admin booking endpoints"""
+    filters = filters or filter_args()
+    conditions = []
+    if filters['status']:
+        conditions.append(Booking.status == filters['status'])
+    if filters['service_type']:
+        conditions.append(Booking.service_type == filters['service_type'])
+    if filters['driver']:
+        conditions.append(Booking.driver_assigned == filters['driver'])
+    if filters['date_from']:
+        conditions.append(Booking.pickup_date >= filters['date_from'])
+    if filters['date_to']:
+        conditions.append(Booking.pickup_date <= filters['date_to'])
+    return conditions
+
+@admin_bp.route('/bookings', methods=['GET'])
+@require_admin()
+def list_bookings():
+    """List bookings ordered by pickup date, with keyset (cursor) pagination.
+
+    Pass the returned next_cursor back as ?cursor= to get the following page.
+    Unlike OFFSET, every page is a range seek on the (..., pickup_date, id)
+    indexes, so deep pages cost the same as the first one.
+    """
+    try:
+        conditions = booking_filters()
+        limit = min(max(request.args.get('limit', BOOKING_PAGE_SIZE, type=int), 1), MAX_BOOKING_PAGE_SIZE)
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            after_date, after_pk = decode_cursor(cursor)
+            # The plain >= lets SQLite seek straight to the cursor in the index,
+            # the OR then skips the rows of that day already returned
+            conditions.append(Booking.pickup_date >= after_date)
+            conditions.append(or_(
+                Booking.pickup_date > after_date,
+                and_(Booking.pickup_date == after_date, Booking.id > after_pk)
+            ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with read_session() as read:
+            bookings = read.scalars(
+                select(Booking)
+                .where(*conditions)
+                .order_by(Booking.pickup_date, Booking.id)
+                .limit(limit + 1)
+            ).all()
+
+            next_cursor = None
+            if len(bookings) > limit:
+                bookings = bookings[:limit]
+                last = bookings[-1]
+                next_cursor = encode_cursor(last.pickup_date, last.id)
+            payload = [booking.to_dict() for booking in bookings]
+
+        return jsonify({
+            'bookings': payload,
+            'count': len(payload),
+            'next_cursor': next_cursor
+        })
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to list bookings: {str(e)}'}), 500
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+@admin_bp.route('/bookings/search', methods=['GET'])
+@require_admin()
+def search_bookings():
+    """Find bookings by partial name, email, phone, address or special requests.
+
+    Every word of ?q= must match the start of a word in one of those fields;
+    results are ranked, best first, and paged with ?page= (from 1) and ?limit=.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing required parameter: q'}), 400
+    limit = min(max(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), 1), MAX_SEARCH_PAGE_SIZE)
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    try:
+        with read_session() as read:
+            bookings = booking_search.search(read, query, limit + 1, (page - 1) * limit)
+            payload = [booking.to_dict() for booking in bookings[:limit]]
+
+        return jsonify({
+            'bookings': payload,
+            'count': len(payload),
+            'page': page,
+            'next_page': page + 1 if len(bookings) > limit else None
+        })
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to search bookings: {str(e)}'}), 500
+
+@admin_bp.route('/bookings/export', methods=['GET'])
+@require_admin()
+def export_bookings():
+    """Stream bookings as NDJSON (default) or CSV, with the same filters as the listing.
+
+    Rows are read in batches from a column-projected query and written out as
+    they arrive, so memory use stays flat however many rows match. Archived
+    bookings are included.
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+    try:
+        filters = filter_args()
+        statement = export_statement(booking_filters(filters))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    batches = iter_batches(statement, engine=read_engine())
+    if booking_archive.has_rows(filters['date_from'], filters['date_to']):
+        # Archived bookings are merged in, in the same (pickup_date, id) order
+        batches = merge_rows(batches, booking_archive.iter_rows(**filters))
+    if export_format == 'csv':
+        body, mimetype = stream_csv(batches), 'text/csv'
+    else:
+        body, mimetype = stream_ndjson(batches), 'application/x-ndjson'
+
+    filename = f"bookings-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@admin_bp.route('/bookings/<booking_id>', methods=['GET'])
+@require_admin()
+def get_booking(booking_id):
+    """One booking by booking_id, looked up in the archive if it has been archived"""
+    booking = Booking.query.filter_by(booking_id=booking_id).first()
+    archived = False
+    if booking is None:
+        booking = booking_archive.get(booking_id)
+        archived = booking is not None
+    if booking is None:
+        return jsonify({'error': 'Booking not found'}), 404
+    return jsonify({'booking': booking.to_dict(), 'archived': archived})
+
+BOOKING_STATUSES = ('pending', 'confirmed', 'completed', 'cancelled')
+
+@admin_bp.route('/bookings/<booking_id>', methods=['PATCH'])
+@require_admin()
+def update_booking(booking_id):
+    """Change a booking's status, final price or admin notes.
+
+    Cancelling or completing a booking gives its slots back, reopening it
+    takes them again (409 if they have been booked since).
+    """
+    data = request.get_json(silent=True) or {}
+    booking = Booking.query.filter_by(booking_id=booking_id).first()
+    if not booking:
+        return jsonify({'error': 'Booking not found'}), 404
+
+    status = data.get('status', booking.status)
+    if status not in BOOKING_STATUSES:
+        return jsonify({'error': f"Invalid status, expected one of: {', '.join(BOOKING_STATUSES)}"}), 400
+    final_price = data.get('final_price', booking.final_price)
+    if final_price is not None:
+        try:
+            final_price = float(final_price)
+        except (TypeError, ValueError):
+            final_price = -1
+        if final_price < 0:
+            return jsonify({'error': 'Invalid final_price'}), 400
+
+    try:
+        was_active = booking.status in ACTIVE_STATUSES
+        if was_active and status not in ACTIVE_STATUSES:
+            slot_capacity.release(booking)
+        elif not was_active and status in ACTIVE_STATUSES:
+            rejected = slot_capacity.reserve([{
+                'pickup_date': booking.pickup_date,
+                'pickup_time': booking.pickup_time,
+                'pickup_location': booking.pickup_location,
+                'dropoff_location': booking.dropoff_location,
+                'return_trip': booking.return_trip,
+                'vehicle_type': booking.vehicle_type
+            }])
+            if rejected:
+                raise rejected[0][1]
+
+        booking.status = status
+        booking.final_price = final_price
+        if 'admin_notes' in data:
+            booking.admin_notes = data['admin_notes']
+        db.session.commit()
+        booking_status.invalidate(booking_id)
+        dispatch_service.refresh()
+        return jsonify({'success': True, 'booking': booking.to_dict()})
+
+    except SlotFull as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to update booking: {str(e)}'}), 500
+
+@admin_bp.route('/stats', methods=['GET'])
+@require_admin()
+def booking_stats():
+    """Booking counts and revenue for the dashboard, read from the rollups only.
+
+    ?group_by= takes a comma-separated subset of day, status, service_type
+    and vehicle_type (default day); status, service_type, vehicle_type,
+    date_from and date_to filter like the listing.
+    """
+    group_by = [name.strip() for name in request.args.get('group_by', 'day').split(',') if name.strip()]
+    unknown = [name for name in group_by if name not in ROLLUP_KEYS]
+    if unknown:
+        return jsonify({'error': f"Invalid group_by: {', '.join(unknown)}"}), 400
+
+    try:
+        conditions = []
+        for name in ('status', 'service_type', 'vehicle_type'):
+            if request.args.get(name):
+                conditions.append(getattr(BookingRollup, name) == request.args[name])
+        date_from = parse_date_arg('date_from')
+        date_to = parse_date_arg('date_to')
+        if date_from:
+            conditions.append(BookingRollup.day >= date_from)
+        if date_to:
+            conditions.append(BookingRollup.day <= date_to)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with read_session() as read:
+            groups = booking_rollups.summary(read, group_by, conditions)
+            totals = booking_rollups.summary(read, [], conditions)
+        return jsonify({
+            'group_by': group_by,
+            'groups': groups,
+            'totals': totals[0] if totals else {'bookings': 0, 'estimated_revenue': 0, 'final_revenue': 0}
+        })
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to load stats: {str(e)}'}), 500
+
+@admin_bp.route('/drivers', methods=['GET'])
+@require_admin()
+def list_drivers():
+    """List drivers"""
+    drivers = Driver.query.order_by(Driver.name).all()
+    return jsonify({'drivers': [driver.to_dict() for driver in drivers]})
+
+@admin_bp.route('/drivers', methods=['POST'])
+@require_admin()
+def create_driver():
+    """Add a driver that bookings can be assigned to"""
+    data = request.get_json(silent=True) or {}
+    if not data.get('name'):
+        return jsonify({'error': 'Missing required field: name'}), 400
+    if data.get('home_zone') and data['home_zone'] not in ZONES:
+        return jsonify({'error': f"Unknown home_zone: {data['home_zone']}"}), 400
+
+    try:
+        driver = Driver(
+            name=data['name'],
+            phone=data.get('phone'),
+            email=data.get('email'),
+            vehicle_type=data.get('vehicle_type') or 'standard',
+            home_zone=data.get('home_zone'),
+            active=data.get('active', True)
+        )
+        db.session.add(driver)
+        db.session.commit()
+        dispatch_service.refresh()
+        return jsonify({'success': True, 'driver': driver.to_dict()}), 201
+
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': f"Driver {data['name']} already exists"}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to create driver: {str(e)}'}), 500
+
+@admin_bp.route('/bookings/<booking_id>/suggest-driver', methods=['GET'])
+@require_admin()
+def suggest_driver(booking_id):
+    """Nearest free drivers for a booking"""
+    booking = Booking.query.filter_by(booking_id=booking_id).first()
+    if not booking:
+        return jsonify({'error': 'Booking not found'}), 404
+
+    limit = min(max(request.args.get('limit', 3, type=int), 1), 20)
+    dispatch_service.refresh()
+    suggestions = dispatch_service.suggest(booking, limit=limit)
+    return jsonify({
+        'booking_id': booking_id,
+        'drivers': [
+            {**driver._asdict(), 'distance_miles': miles}
+            for driver, miles in suggestions
+        ]
+    })
+
+@admin_bp.route('/bookings/<booking_id>/assign', methods=['POST'])
+@require_admin()
+def assign_driver(booking_id):
+    """Assign a driver to a booking, refusing overlapping trips"""
+    data = request.get_json(silent=True) or {}
+    booking = Booking.query.filter_by(booking_id=booking_id).first()
+    if not booking:
+        return jsonify({'error': 'Booking not found'}), 404
+    if not data.get('driver'):
+        return jsonify({'error': 'Missing required field: driver'}), 400
+
+    try:
+        dispatch_service.assign(booking, data['driver'])
+        booking_status.invalidate(booking_id)
+        return jsonify({'success': True, 'booking': booking.to_dict()})
+
+    except DispatchConflict as e:
+        return jsonify({'error': str(e), 'conflicting_booking_id': e.booking_id}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to assign driver: {str(e)}'}), 500
+
+@admin_bp.route('/dispatch/auto-assign', methods=['POST'])
+@require_admin()
+def auto_assign_drivers():
+    """Assign the nearest free driver to every unassigned booking of a day"""
+    data = request.get_json(silent=True) or {}
+    try:
+        day = datetime.strptime(data.get('date') or '', '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+
+    try:
+        assigned, unassigned = dispatch_service.auto_assign(day)
+        booking_status.invalidate(*(booking_id for booking_id, _ in assigned))
+        return jsonify({
+            'success': True,
+            'assigned': [{'booking_id': booking_id, 'driver': driver} for booking_id, driver in assigned],
+            'unassigned': [booking_id for booking_id, _ in unassigned]
+        })
+
+    except DispatchConflict as e:
+        # Another process assigned the driver at the same time, nothing was saved
+        return jsonify({'error': f'{e}, try again', 'conflicting_booking_id': e.booking_id}), 409
+    except Exception as e:
+        return jsonify({'error': f'Failed to auto-assign drivers: {str(e)}'}), 500
+
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@admin_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, SQL and email metrics in the Prometheus text format.
 
+    Scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>",
+    anyone else needs an admin session.
+    """
+    token = os.getenv('METRICS_TOKEN')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return prometheus_metrics()
+    return require_admin(prometheus_metrics)()
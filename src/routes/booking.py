@@ -1,75 +1,389 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from src.models.booking import db, Booking
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from src.utils.email_service import EmailService
+from src.utils.email_outbox import outbox_workers
+from src.utils.booking_ids import booking_ids
+from src.utils.pricing import quote_many
+from src.utils.capacity import slot_capacity
+from src.utils.rollups import booking_rollups
+from src.utils.booking_status import booking_status
+from src.utils.idempotency import MAX_KEY_LENGTH, idempotency_keys, request_fingerprint
 from datetime import datetime
-import random
-import string
+import json
+import math
+import os
 
 booking_bp = Blueprint('booking', __name__)
 email_service = EmailService()
 
+BULK_BOOKING_LIMIT = int(os.getenv('BULK_BOOKING_LIMIT', '1000'))
+
 def generate_booking_id():
     """Generate a unique booking ID"""
-    prefix = "ZGR"
-    suffix = ''.join(random.choices(string.digits, k=6))
-    return f"{prefix}{suffix}"
+    return booking_ids.next_id()
+
+def parse_flag(value):
+    """Read a checkbox-style option that may arrive as a bool, number or string"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def price_bookings(rows):
+    """Fill in estimated_price for booking column values, in one batch"""
+    for values, trip_quote in zip(rows, quote_many(rows)):
+        values['estimated_price'] = trip_quote['price']
+
+# Trip fields the pricing looks up by value
+QUOTE_TEXT_FIELDS = ('service', 'pickup_location', 'dropoff_location', 'vehicle_type')
+
+def parse_booking(data):
+    """Validate a booking payload, returns (column values, None) or (None, error)"""
+    if not isinstance(data, dict):
+        return None, 'Booking must be a JSON object'
+
+    # الحقول المطلوبة فقط حسب الواجهة الأمامية
+    required_fields = [
+        'service', 'pickup_location', 'dropoff_location',
+        'pickup_date', 'pickup_time', 'passengers',
+        'first_name', 'email', 'phone'
+    ]
+    
+    for field in required_fields:
+        if field not in data or not data[field]:
+            return None, f'Missing required field: {field}'
+    # Priced straight away, so they must be strings
+    for field in QUOTE_TEXT_FIELDS:
+        if data.get(field) and not isinstance(data[field], str):
+            return None, f'Invalid {field}, expected a string'
+
+    # تحويل التاريخ والوقت
+    try:
+        pickup_date = datetime.strptime(data['pickup_date'], '%Y-%m-%d').date()
+        pickup_time = datetime.strptime(data['pickup_time'], '%H:%M').time()
+    except (TypeError, ValueError) as e:
+        return None, f'Invalid date/time format: {str(e)}'
+
+    try:
+        passengers = int(str(data['passengers']).replace('+', ''))
+    except ValueError:
+        return None, f"Invalid passengers: {data['passengers']}"
+
+    return {
+        'service_type': data['service'],
+        'vehicle_type': data.get('vehicle_type') or 'standard',
+        'pickup_location': data['pickup_location'],
+        'dropoff_location': data['dropoff_location'],
+        'pickup_date': pickup_date,
+        'pickup_time': pickup_time,
+        'passengers': passengers,
+        'first_name': data['first_name'],
+        'last_name': data.get('last_name', ''),
+        'email': data['email'],
+        'phone': data['phone'],
+        'special_requests': data.get('special_requests', ''),
+        'return_trip': parse_flag(data.get('return_trip')),
+        'waiting_time': parse_flag(data.get('waiting_time')),
+        'meet_greet': parse_flag(data.get('meet_greet')),
+        'status': 'pending'
+    }, None
+
+def replay_response(idempotency_key, fingerprint):
+    """The stored response for an Idempotency-Key, an error if the key was used
+    for a different request, or None when the request has to be processed"""
+    stored = idempotency_keys.lookup(idempotency_key)
+    if stored is None:
+        return None
+    if stored.fingerprint != fingerprint:
+        return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+    response = jsonify(stored.body)
+    response.status_code = stored.status_code
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
 
 @booking_bp.route('/bookings', methods=['POST'])
 def create_booking():
-    """Create a new booking (minimal version)"""
+    """Create a new booking (minimal version).
+
+    With an Idempotency-Key header, a retry of the same request gets the
+    original response back instead of creating a second booking.
+    """
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is not None:
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters'}), 400
+        fingerprint = request_fingerprint()
+        replay = replay_response(idempotency_key, fingerprint)
+        if replay is not None:
+            return replay
+
     try:
         data = request.get_json()
 
-        # الحقول المطلوبة فقط حسب الواجهة الأمامية
-        required_fields = [
-            'service', 'pickup_location', 'dropoff_location',
-            'pickup_date', 'pickup_time', 'passengers',
-            'first_name', 'email', 'phone'
-        ]
-        
-        for field in required_fields:
-            if field not in data or not data[field]:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-
-        # تحويل التاريخ والوقت
-        try:
-            pickup_date = datetime.strptime(data['pickup_date'], '%Y-%m-%d').date()
-            pickup_time = datetime.strptime(data['pickup_time'], '%H:%M').time()
-        except ValueError as e:
-            return jsonify({'error': f'Invalid date/time format: {str(e)}'}), 400
+        values, error = parse_booking(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        price_bookings([values])
 
-        # إنشاء رقم حجز عشوائي
+        # إنشاء رقم حجز
+        # Before the capacity check: a new ID block is reserved on its own
+        # connection, which must not wait on this transaction's write lock
         booking_id = generate_booking_id()
 
+        if idempotency_key is not None:
+            try:
+                claimed_key = idempotency_keys.claim(idempotency_key, fingerprint)
+            except IntegrityError:
+                # A retry that raced the original request, which has finished by now
+                db.session.rollback()
+                replay = replay_response(idempotency_key, fingerprint)
+                if replay is not None:
+                    return replay
+                return jsonify({'error': 'A request with this Idempotency-Key is still being processed'}), 409
+
+        # Takes a vehicle in each 15-minute slot of the trip, in this transaction
+        rejected = slot_capacity.reserve([values])
+        if rejected:
+            db.session.rollback()
+            return jsonify({'error': str(rejected[0][1])}), 409
+
         # إنشاء الحجز
-        booking = Booking(
-            booking_id=booking_id,
-            service_type=data['service'],
-            pickup_location=data['pickup_location'],
-            dropoff_location=data['dropoff_location'],
-            pickup_date=pickup_date,
-            pickup_time=pickup_time,
-            passengers=int(data['passengers'].replace('+', '')) if '+' in str(data['passengers']) else int(data['passengers']),
-            first_name=data['first_name'],
-            email=data['email'],
-            phone=data['phone'],
-            special_requests=data.get('special_requests', ''),
-            status='pending'
-        )
+        booking = Booking(booking_id=booking_id, **values)
 
         db.session.add(booking)
-        db.session.commit()
+        db.session.flush()
 
         # إرسال إيميلات تأكيد
-        email_service.send_booking_confirmation(booking)
-        email_service.send_admin_notification(booking)
+        # Queued in the outbox with the booking, delivered by the background workers
+        email_service.queue_booking_emails(booking)
 
-        return jsonify({
+        payload = {
             'success': True,
             'booking_id': booking_id,
             'message': 'Booking created successfully'
-        }), 201
+        }
+        status_token = booking_status.token(booking_id)
+        if status_token is not None:
+            payload['status_token'] = status_token
+        if idempotency_key is not None:
+            idempotency_keys.complete(claimed_key, 201, payload)
+        db.session.commit()
+        outbox_workers.notify()
+        if idempotency_key is not None:
+            idempotency_keys.remember(idempotency_key, fingerprint, 201, payload)
+
+        return jsonify(payload), 201
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to create booking: {str(e)}'}), 500
+
+@booking_bp.route('/bookings/<booking_id>', methods=['GET'])
+def get_booking_status(booking_id):
+    """Status of a booking for its customer, given the booking email or status token.
+
+    Polls that send the current ETag in If-None-Match get an empty 304.
+    """
+    email = request.args.get('email')
+    token = request.args.get('token')
+    if not email and not token:
+        return jsonify({'error': 'Missing email or token'}), 400
+
+    try:
+        if token:
+            # A forged token (or any token, without BOOKING_STATUS_SECRET) is
+            # turned away without touching the database
+            entry = booking_status.lookup(booking_id) if booking_status.verify_token(booking_id, token) else None
+        else:
+            entry = booking_status.lookup(booking_id)
+            if entry is not None and not booking_status.verify_email(entry, email):
+                entry = None
+    except Exception as e:
+        return jsonify({'error': f'Failed to load booking: {str(e)}'}), 500
+
+    # Unknown booking or wrong email: same answer, so bookings cannot be probed
+    if entry is None:
+        return jsonify({'error': 'Booking not found'}), 404
+
+    headers = {'ETag': f'"{entry.etag}"', 'Cache-Control': 'private, no-cache'}
+    if request.if_none_match.contains_weak(entry.etag):
+        return Response(status=304, headers=headers)
+    return Response(entry.body, mimetype='application/json', headers=headers)
+
+def read_bulk_payload():
+    """Read a bulk request body: a JSON array, {"bookings": [...]} or NDJSON.
+
+    Returns (items, None) or (None, error). NDJSON lines that are not valid
+    JSON come back as an exception instance in their slot, so they are
+    reported per row like any other invalid booking. NDJSON parsing stops
+    one line past BULK_BOOKING_LIMIT, which is enough to reject the request.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            if len(items) > BULK_BOOKING_LIMIT:
+                break
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(e)
+        return items, None
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('bookings')
+    if not isinstance(data, list):
+        return None, 'Expected a JSON array of bookings or an NDJSON body'
+    return data, None
+
+@booking_bp.route('/bookings/bulk', methods=['POST'])
+def create_bookings_bulk():
+    """Create many bookings in one request and one transaction.
+
+    Every row is validated first; the valid ones are checked against slot
+    capacity, get a block of booking IDs, are written with a single
+    executemany INSERT and have their emails queued in the same transaction.
+    Invalid rows and rows without a free vehicle are reported by index and
+    skipped.
+    """
+    items, error = read_bulk_payload()
+    if error:
+        return jsonify({'error': error}), 400
+    if not items:
+        return jsonify({'error': 'No bookings submitted'}), 400
+    if len(items) > BULK_BOOKING_LIMIT:
+        return jsonify({'error': f'At most {BULK_BOOKING_LIMIT} bookings per request'}), 413
+
+    rows = []
+    indexes = []
+    errors = []
+    for index, data in enumerate(items):
+        if isinstance(data, Exception):
+            errors.append({'index': index, 'error': f'Invalid JSON: {str(data)}'})
+            continue
+        values, error = parse_booking(data)
+        if error:
+            errors.append({'index': index, 'error': error})
+            continue
+        rows.append(values)
+        indexes.append(index)
+
+    if not rows:
+        return jsonify({'success': False, 'created': [], 'errors': errors}), 400
+
+    try:
+        price_bookings(rows)
+        now = datetime.utcnow()
+        # IDs first, see create_booking; those of rejected rows are simply skipped
+        for values, booking_id in zip(rows, booking_ids.allocate(len(rows))):
+            values.update(
+                booking_id=booking_id,
+                final_price=None,
+                admin_notes=None,
+                driver_assigned=None,
+                created_at=now,
+                updated_at=now
+            )
+
+        # Rows whose slots are already full are reported like invalid ones
+        rejected = slot_capacity.reserve(rows)
+        for position, error in reversed(rejected):
+            errors.append({'index': indexes.pop(position), 'error': str(error)})
+            rows.pop(position)
+        errors.sort(key=lambda item: item['index'])
+        if not rows:
+            db.session.rollback()
+            return jsonify({'success': False, 'created': [], 'errors': errors}), 409
+
+        db.session.execute(insert(Booking), rows)
+        # الإدراج المباشر لا يمر بأحداث ORM، لذلك نحدّث الإحصاءات يدوياً
+        booking_rollups.add_rows(rows)
+        email_service.queue_many(rows)
+        db.session.commit()
+        outbox_workers.notify()
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to create bookings: {str(e)}'}), 500
+
+    return jsonify({
+        'success': True,
+        'created': [
+            {'index': index, 'booking_id': values['booking_id']}
+            for index, values in zip(indexes, rows)
+        ],
+        'errors': errors
+    }), 207 if errors else 201
+
+@booking_bp.route('/quote', methods=['POST'])
+def get_quote():
+    """Price one trip, or a list of candidate trips, without touching the database"""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('trips'), list):
+        data = data['trips']
+    single = isinstance(data, dict)
+    items = [data] if single else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a trip object or a list of trips'}), 400
+
+    trips = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            return jsonify({'error': 'Trip must be a JSON object', 'index': index}), 400
+        for field in ('service', 'pickup_location', 'dropoff_location'):
+            if not item.get(field):
+                return jsonify({'error': f'Missing required field: {field}', 'index': index}), 400
+        for field in QUOTE_TEXT_FIELDS:
+            if item.get(field) and not isinstance(item[field], str):
+                return jsonify({'error': f'Invalid {field}, expected a string', 'index': index}), 400
+        try:
+            passengers = int(str(item.get('passengers') or 1).replace('+', ''))
+            hours = float(item['hours']) if item.get('hours') else None
+            if hours is not None and not math.isfinite(hours):
+                raise ValueError(hours)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid passengers or hours', 'index': index}), 400
+
+        trips.append({
+            'service_type': item['service'],
+            'vehicle_type': item.get('vehicle_type') or 'standard',
+            'pickup_location': item['pickup_location'],
+            'dropoff_location': item['dropoff_location'],
+            'passengers': passengers,
+            'hours': hours,
+            'return_trip': parse_flag(item.get('return_trip')),
+            'waiting_time': parse_flag(item.get('waiting_time')),
+            'meet_greet': parse_flag(item.get('meet_greet')),
+        })
+
+    quotes = quote_many(trips)
+    return jsonify(quotes[0] if single else {'quotes': quotes})
+
+@booking_bp.route('/availability', methods=['GET'])
+def get_availability():
+    """Free vehicles per vehicle type for each 15-minute slot of a day"""
+    try:
+        day = datetime.strptime(request.args.get('date') or '', '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+
+    try:
+        availability = slot_capacity.availability(day)
+    except Exception as e:
+        return jsonify({'error': f'Failed to load availability: {str(e)}'}), 500
+
+    vehicle_type = request.args.get('vehicle_type')
+    if vehicle_type:
+        availability = {
+            **availability,
+            'capacity': {vehicle_type: slot_capacity.capacity(vehicle_type)},
+            'slots': [
+                {'time': slot['time'], 'available': {vehicle_type: slot['available'].get(vehicle_type, slot_capacity.capacity(vehicle_type))}}
+                for slot in availability['slots']
+            ]
+        }
+    return jsonify(availability)
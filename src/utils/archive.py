@@ -0,0 +1,361 @@
+import heapq
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta
+from datetime import time as time_of_day
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import make_url
+from src.models.booking import db, ArchiveSegment, Booking, PendingSegment
+from src.utils.database import is_sqlite_file
+from src.utils.export import EXPORT_COLUMNS, EXPORT_FIELDS
+
+ARCHIVED_STATUSES = ('completed', 'cancelled')
+
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+
+# Index file: header, block table, then one entry per booking sorted by booking_id
+INDEX_MAGIC = b'ZGA1'
+INDEX_HEADER = struct.Struct('<4sII')  # magic, blocks, entries
+BLOCK_ENTRY = struct.Struct('<QI')  # offset and length of a compressed block in the segment
+BOOKING_ENTRY = struct.Struct('<20sI')  # booking_id (NUL padded), block number
+BOOKING_ID_SIZE = 20
+
+BOOKING_ID = EXPORT_FIELDS.index('booking_id')
+PICKUP_DATE = EXPORT_FIELDS.index('pickup_date')
+BOOKING_PK = EXPORT_FIELDS.index('id')
+STATUS = EXPORT_FIELDS.index('status')
+SERVICE_TYPE = EXPORT_FIELDS.index('service_type')
+DRIVER = EXPORT_FIELDS.index('driver_assigned')
+
+
+def database_archive_dir(url):
+    """Default archive directory of a database: beside its SQLite file (app.db -> app-archive)"""
+    if not is_sqlite_file(url):
+        return None
+    return os.path.splitext(os.path.abspath(make_url(url).database))[0] + '-archive'
+
+
+def archive_order(row):
+    """Sort key of rows in segments and exports"""
+    return row[PICKUP_DATE], row[BOOKING_PK]
+
+
+def _decoders():
+    decoders = []
+    for column in EXPORT_COLUMNS:
+        python_type = column.type.python_type
+        if python_type is date:
+            decoders.append(date.fromisoformat)
+        elif python_type is datetime:
+            decoders.append(datetime.fromisoformat)
+        elif python_type is time_of_day:
+            decoders.append(time_of_day.fromisoformat)
+        else:
+            decoders.append(None)
+    return decoders
+
+
+DECODERS = _decoders()
+
+
+def encode_row(row):
+    return json.dumps(
+        [value.isoformat() if isinstance(value, (date, time_of_day)) else value for value in row],
+        separators=(',', ':')
+    )
+
+
+def decode_row(line):
+    """A stored row back as a tuple of column values, like a row read from booking"""
+    return tuple(
+        decode(value) if decode and value is not None else value
+        for decode, value in zip(DECODERS, json.loads(line))
+    )
+
+
+def booking_key(booking_id):
+    return booking_id.encode().ljust(BOOKING_ID_SIZE, b'\0')
+
+
+class Segment:
+    """A segment file and its index, memory-mapped"""
+
+    def __init__(self, directory, name):
+        with open(os.path.join(directory, name + SEGMENT_SUFFIX), 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(os.path.join(directory, name + INDEX_SUFFIX), 'rb') as f:
+            self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.block_count, self.entry_count = INDEX_HEADER.unpack_from(self.index, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f'{name}{INDEX_SUFFIX} is not an archive index')
+        self.entries_at = INDEX_HEADER.size + self.block_count * BLOCK_ENTRY.size
+
+    def block(self, number):
+        offset, length = BLOCK_ENTRY.unpack_from(self.index, INDEX_HEADER.size + number * BLOCK_ENTRY.size)
+        return zlib.decompress(self.data[offset:offset + length]).split(b'\n')
+
+    def find(self, booking_id):
+        """Binary search of the index, returns the stored row or None"""
+        key = booking_key(booking_id)
+        low, high = 0, self.entry_count
+        while low < high:
+            middle = (low + high) // 2
+            position = self.entries_at + middle * BOOKING_ENTRY.size
+            current = self.index[position:position + BOOKING_ID_SIZE]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                _, number = BOOKING_ENTRY.unpack_from(self.index, position)
+                # Only decode the lines that can be the booking
+                needle = json.dumps(booking_id).encode()
+                for line in self.block(number):
+                    if needle in line:
+                        row = decode_row(line)
+                        if row[BOOKING_ID] == booking_id:
+                            return row
+                return None
+        return None
+
+    def rows(self):
+        for number in range(self.block_count):
+            for line in self.block(number):
+                yield decode_row(line)
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+class BookingArchive:
+    """Cold storage for completed and cancelled bookings past a horizon.
+
+    The archive job moves them, a month of pickups at a time, into
+    append-only segment files: zlib-compressed blocks of rows in (pickup
+    date, id) order, with a sidecar index of booking_id -> block that is
+    binary-searched through mmap. A segment is listed in ArchiveSegment in
+    the same transaction that deletes its rows from booking, so a booking is
+    always in exactly one place. Every segment is first committed as a
+    PendingSegment, before its files are written, so files left by an
+    interrupted run are known to this database and cleaned up by its next
+    run; files it never recorded are left alone. Rows are deleted with a
+    core DELETE, which keeps them counted in the rollups.
+
+    Segments go to ARCHIVE_DIR, by default a directory beside the SQLite
+    file, so each database has its own; other databases need ARCHIVE_DIR.
+    """
+
+    def __init__(self, directory=None, after_days=None, block_rows=None):
+        self.configured_directory = directory or os.getenv('ARCHIVE_DIR')
+        self.directory = self.configured_directory
+        self.after_days = after_days if after_days is not None else int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+        self.block_rows = block_rows or int(os.getenv('ARCHIVE_BLOCK_ROWS', '256'))
+        self._segments = {}
+        self._names = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions['archive'] = self
+        app.cli.add_command(archive_cli)
+        self.directory = (
+            app.config.get('ARCHIVE_DIR') or self.configured_directory
+            or database_archive_dir(app.config['SQLALCHEMY_DATABASE_URI'])
+        )
+
+    def segment_names(self, date_from=None, date_to=None):
+        """Listed segments overlapping a pickup date range, newest first"""
+        conditions = []
+        if date_from:
+            conditions.append(ArchiveSegment.pickup_to >= date_from)
+        if date_to:
+            conditions.append(ArchiveSegment.pickup_from <= date_to)
+        return db.session.scalars(
+            select(ArchiveSegment.name).where(*conditions).order_by(ArchiveSegment.created_at.desc(), ArchiveSegment.name.desc())
+        ).all()
+
+    def segment(self, name):
+        with self._lock:
+            segment = self._segments.get(name)
+            if segment is None:
+                segment = self._segments[name] = Segment(self.directory, name)
+            return segment
+
+    def get(self, booking_id):
+        """An archived booking as a transient Booking, or None"""
+        if len(booking_id.encode()) > BOOKING_ID_SIZE:
+            return None
+        # Listed segments never change, so the list is only read again on a
+        # miss, in case another process has archived the booking since
+        searched = set()
+        for names in (self._known_segments, self._refresh_segments):
+            for name in names():
+                if name in searched:
+                    continue
+                searched.add(name)
+                row = self.segment(name).find(booking_id)
+                if row is not None:
+                    return Booking(**dict(zip(EXPORT_FIELDS, row)))
+        return None
+
+    def _known_segments(self):
+        if self._names is None:
+            return self._refresh_segments()
+        return self._names
+
+    def _refresh_segments(self):
+        self._names = self.segment_names()
+        return self._names
+
+    def iter_rows(self, status=None, service_type=None, driver=None, date_from=None, date_to=None):
+        """Archived rows matching the admin filters, in (pickup_date, id) order"""
+        segments = [self.segment(name) for name in self.segment_names(date_from, date_to)]
+        for row in heapq.merge(*(segment.rows() for segment in segments), key=archive_order):
+            if status and row[STATUS] != status:
+                continue
+            if service_type and row[SERVICE_TYPE] != service_type:
+                continue
+            if driver and row[DRIVER] != driver:
+                continue
+            if date_from and row[PICKUP_DATE] < date_from:
+                continue
+            if date_to and row[PICKUP_DATE] > date_to:
+                continue
+            yield row
+
+    def has_rows(self, date_from=None, date_to=None):
+        return bool(self.segment_names(date_from, date_to))
+
+    def run(self, before=None):
+        """Archive completed and cancelled bookings picked up before a date, returns how many"""
+        if not self.directory:
+            raise RuntimeError('ARCHIVE_DIR must be set when the database is not a SQLite file')
+        before = before or date.today() - timedelta(days=self.after_days)
+        os.makedirs(self.directory, exist_ok=True)
+        self.remove_orphans()
+
+        conditions = [Booking.status.in_(ARCHIVED_STATUSES), Booking.pickup_date < before]
+        first = db.session.scalar(select(func.min(Booking.pickup_date)).where(*conditions))
+        db.session.rollback()
+        if first is None:
+            return 0
+
+        archived = 0
+        month = first.replace(day=1)
+        while month < before:
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            archived += self._archive_range(conditions, month, min(next_month, before))
+            month = next_month
+        return archived
+
+    def _archive_range(self, conditions, start, end):
+        name = f"bookings-{start.strftime('%Y-%m')}-{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
+        # Recorded before any file is written, so an interrupted run leaves
+        # nothing behind that remove_orphans does not know about
+        db.session.add(PendingSegment(name=name))
+        db.session.commit()
+
+        # Listing the segment first takes the write lock (SQLite), so the rows
+        # read next cannot change before they are deleted
+        segment = ArchiveSegment(name=name)
+        db.session.add(segment)
+        db.session.flush()
+        rows = db.session.execute(
+            select(*EXPORT_COLUMNS)
+            .where(*conditions, Booking.pickup_date >= start, Booking.pickup_date < end)
+            .order_by(Booking.pickup_date, Booking.id)
+            .with_for_update()
+        ).all()
+        if not rows:
+            db.session.rollback()
+            db.session.execute(delete(PendingSegment).where(PendingSegment.name == name))
+            db.session.commit()
+            return 0
+
+        segment.size = self._write_segment(name, rows)
+        segment.bookings = len(rows)
+        segment.pickup_from = rows[0][PICKUP_DATE]
+        segment.pickup_to = rows[-1][PICKUP_DATE]
+        ids = [row[BOOKING_PK] for row in rows]
+        for offset in range(0, len(ids), 500):
+            db.session.execute(delete(Booking).where(Booking.id.in_(ids[offset:offset + 500])))
+        db.session.execute(delete(PendingSegment).where(PendingSegment.name == name))
+        db.session.commit()
+        return len(rows)
+
+    def _write_segment(self, name, rows):
+        """Write the segment and its index, durably, returns the segment size"""
+        blocks = []
+        entries = []
+        path = os.path.join(self.directory, name)
+        with open(path + SEGMENT_SUFFIX + '.tmp', 'wb') as f:
+            for start in range(0, len(rows), self.block_rows):
+                block = rows[start:start + self.block_rows]
+                data = zlib.compress('\n'.join(encode_row(row) for row in block).encode(), 6)
+                blocks.append((f.tell(), len(data)))
+                f.write(data)
+                entries.extend((booking_key(row[BOOKING_ID]), len(blocks) - 1) for row in block)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+
+        entries.sort()
+        with open(path + INDEX_SUFFIX + '.tmp', 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(blocks), len(entries)))
+            f.write(b''.join(BLOCK_ENTRY.pack(*block) for block in blocks))
+            f.write(b''.join(BOOKING_ENTRY.pack(*entry) for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(path + SEGMENT_SUFFIX + '.tmp', path + SEGMENT_SUFFIX)
+        os.replace(path + INDEX_SUFFIX + '.tmp', path + INDEX_SUFFIX)
+        return size
+
+    def remove_orphans(self, min_age=3600):
+        """Delete the files of segments this database's runs never finished,
+        once they are old enough that no run can still be writing them"""
+        names = db.session.scalars(
+            select(PendingSegment.name)
+            .where(PendingSegment.created_at < datetime.utcnow() - timedelta(seconds=min_age))
+        ).all()
+        db.session.rollback()
+        for name in names:
+            for suffix in (SEGMENT_SUFFIX, INDEX_SUFFIX):
+                for path in (os.path.join(self.directory, name + suffix), os.path.join(self.directory, name + suffix + '.tmp')):
+                    if os.path.exists(path):
+                        os.remove(path)
+            db.session.execute(delete(PendingSegment).where(PendingSegment.name == name))
+            db.session.commit()
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+            self._names = None
+
+
+booking_archive = BookingArchive()
+
+archive_cli = AppGroup('archive', help='Cold storage for old bookings')
+
+
+@archive_cli.command('run')
+@click.option('--before', help='Archive bookings picked up before this date (YYYY-MM-DD)')
+def run_command(before):
+    """Move completed and cancelled bookings past the horizon into segment files"""
+    cutoff = datetime.strptime(before, '%Y-%m-%d').date() if before else None
+    start = time.perf_counter()
+    try:
+        archived = booking_archive.run(cutoff)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Archived {archived} bookings in {time.perf_counter() - start:.1f} s')
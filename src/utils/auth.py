@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+from flask import g, jsonify, session
+from sqlalchemy import event
+from src.models.booking import db, User
+
+Principal = namedtuple('Principal', ['id', 'username', 'email', 'is_admin'])
+
+
+class PrincipalCache:
+    """In-process cache of who a user id is, so authorization checks skip the DB.
+
+    Entries expire after ttl seconds and are dropped as soon as the user row
+    is updated or deleted in this process; the TTL bounds how long another
+    process can keep serving an outdated entry.
+    """
+
+    def __init__(self, ttl=None, max_entries=1024):
+        self.ttl = ttl if ttl is not None else float(os.getenv('AUTH_CACHE_TTL', '60'))
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the Principal for user_id (None if there is no such user)"""
+        if user_id is None:
+            return None
+
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        user = db.session.get(User, user_id)
+        principal = self.remember(user) if user else None
+        if principal is None:
+            self._store(user_id, None)
+        return principal
+
+    def remember(self, user):
+        """Cache the principal for a user that was just loaded, returns it"""
+        principal = Principal(user.id, user.username, user.email, bool(user.is_admin))
+        self._store(user.id, principal)
+        return principal
+
+    def invalidate(self, user_id=None):
+        """Forget one user, or everyone when user_id is None"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def _store(self, user_id, principal):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[user_id] = (time.monotonic() + self.ttl, principal)
+
+
+principal_cache = PrincipalCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_principal(mapper, connection, target):
+    principal_cache.invalidate(target.id)
+
+
+def require_admin(f=None):
+    """Decorator to require admin authentication.
+
+    Works bare (@require_admin) or called (@require_admin()) on any view. The
+    admin principal is looked up through principal_cache and exposed as
+    g.admin_user.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not session.get('admin_logged_in'):
+                return jsonify({'error': 'Authentication required'}), 401
+
+            principal = principal_cache.get(session.get('admin_user_id'))
+            if not principal or not principal.is_admin:
+                return jsonify({'error': 'Admin access required'}), 403
+
+            g.admin_user = principal
+            return f(*args, **kwargs)
+        return wrapper
+
+    if f is not None:
+        return decorator(f)
+    return decorator
@@ -0,0 +1,175 @@
+import hashlib
+import hmac
+import os
+import threading
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from src.models.booking import db, IdSequence
+
+PREFIX = 'ZGR'
+
+# Feistel halves are base 1000, so 6-digit blocks are permuted without cycle walking
+HALF = 1000
+BLOCK = HALF * HALF
+ROUNDS = 4
+
+# Damm quasigroup; the check digit catches every single-digit error and
+# every swap of adjacent digits
+DAMM_TABLE = (
+    (0, 3, 1, 7, 5, 9, 8, 6, 4, 2),
+    (7, 0, 9, 2, 1, 5, 4, 8, 6, 3),
+    (4, 2, 0, 6, 8, 7, 1, 3, 5, 9),
+    (1, 7, 5, 0, 9, 8, 3, 4, 2, 6),
+    (6, 1, 2, 3, 0, 4, 5, 9, 7, 8),
+    (3, 6, 7, 4, 2, 0, 9, 5, 8, 1),
+    (5, 8, 6, 9, 7, 2, 0, 1, 3, 4),
+    (8, 9, 4, 5, 3, 6, 2, 0, 1, 7),
+    (9, 4, 3, 8, 6, 1, 7, 2, 0, 5),
+    (2, 5, 8, 1, 4, 3, 6, 7, 9, 0),
+)
+
+
+def damm_check_digit(digits):
+    interim = 0
+    for digit in digits:
+        interim = DAMM_TABLE[interim][int(digit)]
+    return str(interim)
+
+
+class BookingIdAllocator:
+    """Collision-free booking ids handed out from a database sequence.
+
+    Each process reserves a block of sequence numbers with a single UPDATE and
+    then serves ids from memory until the block runs out, so there is one DB
+    round trip per block rather than per booking. Numbers are never reused;
+    a crash only leaves a gap.
+
+    Ids keep the ZGR prefix followed by the sequence number and a Damm check
+    digit. The obfuscated encoding permutes the number with a Feistel network
+    keyed by BOOKING_ID_KEY, so without the key the next id cannot be worked
+    out from earlier ones; it is the default only when the key is set, and
+    plain (sequential) ids are issued otherwise. New ids have at least 7
+    digits and cannot clash with the 6-digit random ids issued before the
+    allocator existed.
+    """
+
+    def __init__(self, sequence='booking_id', block_size=None, encoding=None, key=None):
+        self.sequence = sequence
+        self.block_size = block_size or int(os.getenv('BOOKING_ID_BLOCK_SIZE', '50'))
+        self.key = key or os.getenv('BOOKING_ID_KEY') or None
+        self.encoding = encoding or os.getenv('BOOKING_ID_ENCODING') or ('obfuscated' if self.key else 'plain')
+        self._round_tables = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._next = 0
+        self._end = 0
+
+    def next_id(self):
+        """Return a new booking id"""
+        return self.encode(self._take(1)[0])
+
+    def allocate(self, count):
+        """Return count new booking ids, reserving a larger block if needed"""
+        return [self.encode(number) for number in self._take(count)]
+
+    def _take(self, count):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker must not keep serving its parent's block
+                self._reset()
+
+            numbers = []
+            while len(numbers) < count:
+                if self._next >= self._end:
+                    self._next, self._end = self._reserve_block(
+                        max(self.block_size, count - len(numbers))
+                    )
+                take = min(count - len(numbers), self._end - self._next)
+                numbers.extend(range(self._next, self._next + take))
+                self._next += take
+            return numbers
+
+    def _reserve_block(self, size):
+        """Atomically move the sequence forward by size, returns [start, end)"""
+        table = IdSequence.__table__
+        while True:
+            with db.engine.begin() as connection:
+                end = connection.execute(
+                    update(table)
+                    .where(table.c.name == self.sequence)
+                    .values(next_value=table.c.next_value + size)
+                    .returning(table.c.next_value)
+                ).scalar()
+            if end is not None:
+                return end - size, end
+
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(insert(table).values(name=self.sequence, next_value=1 + size))
+                return 1, 1 + size
+            except IntegrityError:
+                # Another process created the sequence first, go through the UPDATE
+                continue
+
+    def encode(self, number):
+        """Format a sequence number as a booking id"""
+        epoch, low = divmod(number, BLOCK)
+        if self.encoding == 'obfuscated':
+            low = self._permute(low)
+        digits = f'{low:06d}'
+        if epoch:
+            digits = f'{epoch}{digits}'
+        return f'{PREFIX}{digits}{damm_check_digit(digits)}'
+
+    def decode(self, booking_id):
+        """Return the sequence number of an allocated id, or None if it is not valid"""
+        digits = booking_id[len(PREFIX):]
+        if (
+            not booking_id.startswith(PREFIX)
+            or len(digits) < 7
+            or not digits.isdigit()
+            or damm_check_digit(digits) != '0'
+        ):
+            return None
+
+        digits = digits[:-1]
+        epoch = int(digits[:-6] or 0)
+        low = int(digits[-6:])
+        if self.encoding == 'obfuscated':
+            low = self._unpermute(low)
+        return epoch * BLOCK + low
+
+    def is_valid(self, booking_id):
+        return self.decode(booking_id) is not None
+
+    def _tables(self):
+        if self._round_tables is None:
+            if not self.key:
+                raise RuntimeError('BOOKING_ID_KEY must be set for the obfuscated booking id encoding')
+            key = self.key.encode()
+            self._round_tables = [
+                [
+                    int.from_bytes(hmac.new(key, f'{round_}:{value}'.encode(), hashlib.sha256).digest()[:4], 'big') % HALF
+                    for value in range(HALF)
+                ]
+                for round_ in range(ROUNDS)
+            ]
+        return self._round_tables
+
+    def _permute(self, value):
+        left, right = divmod(value, HALF)
+        for table in self._tables():
+            left, right = right, (left + table[right]) % HALF
+        return left * HALF + right
+
+    def _unpermute(self, value):
+        left, right = divmod(value, HALF)
+        for table in reversed(self._tables()):
+            left, right = (right - table[left]) % HALF, left
+        return left * HALF + right
+
+
+booking_ids = BookingIdAllocator()
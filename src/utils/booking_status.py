@@ -0,0 +1,122 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import select
+from src.models.booking import db, Booking
+from src.utils.archive import booking_archive
+
+TOKEN_SALT = 'booking-status'
+
+# What a customer polling their booking gets to see
+STATUS_FIELDS = (
+    'booking_id', 'status', 'service_type', 'vehicle_type',
+    'pickup_location', 'dropoff_location', 'pickup_date', 'pickup_time',
+    'passengers', 'return_trip', 'estimated_price', 'final_price',
+    'driver_assigned', 'updated_at',
+)
+
+CachedStatus = namedtuple('CachedStatus', ['expires', 'updated_at', 'email', 'etag', 'body'])
+
+
+def status_view(booking):
+    data = booking.to_dict()
+    return {field: data[field] for field in STATUS_FIELDS}
+
+
+class BookingStatusCache:
+    """Rendered public status views, keyed on booking_id and updated_at.
+
+    For ttl seconds after it is filled an entry is served from memory; after
+    that one indexed read of updated_at tells whether it is still current,
+    and the booking is only loaded and rendered again when it has changed.
+    Admin routes invalidate the entries of bookings they change, so this
+    process serves the change at once and other processes within ttl. The
+    ETag is a hash of the body, so a poll with a current If-None-Match gets
+    an empty 304.
+
+    Status tokens are signed with BOOKING_STATUS_SECRET; without it no
+    token is issued or accepted and customers look up by email only.
+    """
+
+    def __init__(self, ttl=None, cache_size=None, secret=None):
+        self.secret = secret or os.getenv('BOOKING_STATUS_SECRET') or None
+        self.ttl = ttl if ttl is not None else float(os.getenv('BOOKING_STATUS_TTL', '2'))
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv('BOOKING_STATUS_CACHE_SIZE', '10000'))
+        self._cache = OrderedDict()  # booking_id -> CachedStatus
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions['booking_status'] = self
+
+    def token(self, booking_id):
+        """A signed token that grants access to one booking's status, or None without a secret"""
+        if not self.secret:
+            return None
+        return URLSafeSerializer(self.secret, salt=TOKEN_SALT).dumps(booking_id)
+
+    def verify_token(self, booking_id, token):
+        if not self.secret:
+            return False
+        try:
+            return URLSafeSerializer(self.secret, salt=TOKEN_SALT).loads(token) == booking_id
+        except BadSignature:
+            return False
+
+    def verify_email(self, entry, email):
+        return hmac.compare_digest(email.strip().lower().encode(), entry.email.encode())
+
+    def lookup(self, booking_id):
+        """The current CachedStatus of a booking (live or archived), or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(booking_id)
+            if entry is not None and entry.expires > now:
+                self._cache.move_to_end(booking_id)
+                return entry
+
+        booking = None
+        row = db.session.execute(
+            select(Booking.updated_at).where(Booking.booking_id == booking_id)
+        ).first()
+        if row is not None:
+            updated_at = row.updated_at
+        else:
+            booking = booking_archive.get(booking_id)
+            if booking is None:
+                self.invalidate(booking_id)
+                return None
+            updated_at = booking.updated_at
+
+        if entry is None or entry.updated_at != updated_at:
+            if booking is None:
+                booking = Booking.query.filter_by(booking_id=booking_id).first() or booking_archive.get(booking_id)
+                if booking is None:
+                    return None
+            body = json.dumps(status_view(booking), separators=(',', ':')).encode()
+            entry = CachedStatus(None, booking.updated_at, (booking.email or '').lower(),
+                                 hashlib.sha256(body).hexdigest()[:20], body)
+
+        entry = entry._replace(expires=now + self.ttl)
+        with self._lock:
+            self._cache[booking_id] = entry
+            self._cache.move_to_end(booking_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return entry
+
+    def invalidate(self, *booking_ids):
+        with self._lock:
+            for booking_id in booking_ids:
+                self._cache.pop(booking_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+booking_status = BookingStatusCache()
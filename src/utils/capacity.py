@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+from sqlalchemy import delete, func, insert, select, update
+from src.models.booking import db, Booking, SlotCapacity
+from src.utils.database import upsert
+from src.utils.dispatch import ACTIVE_STATUSES, dispatch_service
+from src.utils.pricing import VEHICLE_MULTIPLIERS
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+def parse_capacities(value):
+    """Parse SLOT_CAPACITY, e.g. 'standard=10,suv=4'"""
+    capacities = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            vehicle_type, count = item.split('=', 1)
+            capacities[vehicle_type.strip()] = int(count)
+    return capacities
+
+
+def slot_label(slot):
+    return f'{slot * SLOT_MINUTES // 60:02d}:{slot * SLOT_MINUTES % 60:02d}'
+
+
+class SlotFull(Exception):
+    """No vehicle of the requested type is left in one of the trip's slots"""
+
+    def __init__(self, vehicle_type, slot_date, slot):
+        super().__init__(f'No {vehicle_type} vehicles available at {slot_label(slot)} on {slot_date.isoformat()}')
+        self.vehicle_type = vehicle_type
+        self.slot_date = slot_date
+        self.slot = slot
+
+
+class CapacityService:
+    """Per-slot booking counters by vehicle type, in 15-minute buckets.
+
+    A booking takes one vehicle in every slot its trip covers (the same
+    interval dispatch uses: driving time plus turnaround). Counters live in
+    SlotCapacity and are changed inside the booking's own transaction: the
+    touched rows are upserted first, which takes the write lock (SQLite) or
+    the row locks (PostgreSQL), so the check and the increment that follow
+    cannot race another writer. Availability is answered from the counters
+    through a short-lived in-process cache.
+    """
+
+    def __init__(self, default_capacity=None, capacities=None, cache_ttl=None):
+        self.default_capacity = default_capacity if default_capacity is not None else int(os.getenv('DEFAULT_SLOT_CAPACITY', '10'))
+        self.capacities = capacities if capacities is not None else parse_capacities(os.getenv('SLOT_CAPACITY'))
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv('AVAILABILITY_CACHE_TTL', '5'))
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions['capacity'] = self
+
+    def backfill(self):
+        """Counters start empty on an existing database, fill them in once (flask init-db)"""
+        today = date.today()
+        if db.session.scalar(select(func.count()).select_from(SlotCapacity)) == 0:
+            if db.session.scalar(select(func.count()).where(Booking.pickup_date >= today)):
+                self.rebuild(today)
+
+    def capacity(self, vehicle_type):
+        return self.capacities.get(vehicle_type, self.default_capacity)
+
+    def slots_for(self, booking):
+        """(slot_date, slot, vehicle_type) keys a booking occupies"""
+        start, end = dispatch_service.trip_interval(booking)
+        keys = []
+        current = start.replace(minute=start.minute - start.minute % SLOT_MINUTES, second=0, microsecond=0)
+        while current < end:
+            keys.append((current.date(), (current.hour * 60 + current.minute) // SLOT_MINUTES, booking.vehicle_type))
+            current += timedelta(minutes=SLOT_MINUTES)
+        return keys
+
+    def reserve(self, rows):
+        """Take a vehicle in every slot of each booking (column value dicts).
+
+        Rows that do not fit are skipped and returned as (index, SlotFull)
+        pairs; the rest are counted in the current transaction, in order.
+        """
+        wanted = [self.slots_for(SimpleNamespace(**row)) for row in rows]
+        keys = set().union(*wanted)
+        if not keys:
+            return []
+
+        counts = self._lock_counters(keys)
+        rejected = []
+        changed = set()
+        for index, (row, row_keys) in enumerate(zip(rows, wanted)):
+            limit = self.capacity(row['vehicle_type'])
+            full = next((key for key in row_keys if counts[key] >= limit), None)
+            if full is not None:
+                rejected.append((index, SlotFull(full[2], full[0], full[1])))
+                continue
+            for key in row_keys:
+                counts[key] += 1
+                changed.add(key)
+
+        self._write_counters(counts, changed)
+        return rejected
+
+    def release(self, booking):
+        """Give back the slots of a booking that was cancelled or moved"""
+        keys = self.slots_for(booking)
+        counts = self._lock_counters(keys)
+        for key in keys:
+            counts[key] = max(counts[key] - 1, 0)
+        self._write_counters(counts, keys)
+
+    def _lock_counters(self, keys):
+        """Make sure the counter rows exist and lock them, returns their values"""
+        dialect_name = db.session.get_bind().dialect.name
+        values = [
+            {'slot_date': slot_date, 'slot': slot, 'vehicle_type': vehicle_type, 'booked': 0}
+            for slot_date, slot, vehicle_type in sorted(keys)
+        ]
+        for start in range(0, len(values), 500):
+            statement = upsert(SlotCapacity, dialect_name).values(values[start:start + 500])
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['slot_date', 'slot', 'vehicle_type'],
+                set_={'booked': SlotCapacity.booked}
+            ))
+
+        dates = {key[0] for key in keys}
+        vehicle_types = {key[2] for key in keys}
+        counts = {
+            (row.slot_date, row.slot, row.vehicle_type): row.booked
+            for row in db.session.execute(
+                select(SlotCapacity.slot_date, SlotCapacity.slot, SlotCapacity.vehicle_type, SlotCapacity.booked)
+                .where(SlotCapacity.slot_date.in_(dates), SlotCapacity.vehicle_type.in_(vehicle_types))
+            )
+        }
+        return {key: counts.get(key, 0) for key in keys}
+
+    def _write_counters(self, counts, keys):
+        if not keys:
+            return
+        db.session.execute(update(SlotCapacity), [
+            {'slot_date': slot_date, 'slot': slot, 'vehicle_type': vehicle_type, 'booked': counts[(slot_date, slot, vehicle_type)]}
+            for slot_date, slot, vehicle_type in keys
+        ])
+        self.invalidate({key[0] for key in keys})
+
+    def rebuild(self, since):
+        """Recount the slots of active bookings from since onwards, and commit"""
+        counts = {}
+        bookings = db.session.execute(
+            select(
+                Booking.pickup_date, Booking.pickup_time, Booking.pickup_location,
+                Booking.dropoff_location, Booking.return_trip, Booking.vehicle_type
+            ).where(Booking.pickup_date >= since, Booking.status.in_(ACTIVE_STATUSES))
+        )
+        for booking in bookings:
+            for key in self.slots_for(booking):
+                counts[key] = counts.get(key, 0) + 1
+
+        db.session.execute(delete(SlotCapacity).where(SlotCapacity.slot_date >= since))
+        if counts:
+            db.session.execute(insert(SlotCapacity), [
+                {'slot_date': slot_date, 'slot': slot, 'vehicle_type': vehicle_type, 'booked': booked}
+                for (slot_date, slot, vehicle_type), booked in counts.items()
+            ])
+        db.session.commit()
+        self.invalidate()
+
+    def availability(self, day):
+        """Free vehicles per vehicle type for every slot of a day"""
+        now = time.monotonic()
+        entry = self._cache.get(day)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        booked = {}
+        for row in db.session.execute(
+            select(SlotCapacity.slot, SlotCapacity.vehicle_type, SlotCapacity.booked)
+            .where(SlotCapacity.slot_date == day)
+        ):
+            booked[(row.slot, row.vehicle_type)] = row.booked
+
+        vehicle_types = sorted(set(VEHICLE_MULTIPLIERS) | set(self.capacities) | {key[1] for key in booked})
+        capacity = {vehicle_type: self.capacity(vehicle_type) for vehicle_type in vehicle_types}
+        result = {
+            'date': day.isoformat(),
+            'slot_minutes': SLOT_MINUTES,
+            'capacity': capacity,
+            'slots': [
+                {
+                    'time': slot_label(slot),
+                    'available': {
+                        vehicle_type: max(capacity[vehicle_type] - booked.get((slot, vehicle_type), 0), 0)
+                        for vehicle_type in vehicle_types
+                    }
+                }
+                for slot in range(SLOTS_PER_DAY)
+            ]
+        }
+        with self._lock:
+            if len(self._cache) >= 256:
+                self._cache.clear()
+            self._cache[day] = (now + self.cache_ttl, result)
+        return result
+
+    def invalidate(self, days=None):
+        """Drop cached availability for some days, or all of them"""
+        with self._lock:
+            if days is None:
+                self._cache.clear()
+            else:
+                for day in days:
+                    self._cache.pop(day, None)
+
+
+slot_capacity = CapacityService()
@@ -0,0 +1,135 @@
+import os
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from src.models.booking import db
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')
+
+READ_BIND = 'read'
+
+
+def env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+def is_sqlite_file(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def read_only_url(url):
+    """The same SQLite file opened read-only, for the admin read engine"""
+    url = make_url(url)
+    path = os.path.abspath(url.database)
+    return f'sqlite:///file:{path}?mode=ro&uri=true'
+
+
+def engine_options(url):
+    """Pool settings for an engine; file-backed SQLite also gets a lock timeout"""
+    if make_url(url).get_backend_name() == 'sqlite' and not is_sqlite_file(url):
+        # In-memory databases live in one connection, let Flask-SQLAlchemy pick the pool
+        return {}
+
+    options = {
+        'pool_size': env_int('DB_POOL_SIZE', 10),
+        'max_overflow': env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': env_int('DB_POOL_RECYCLE', 1800),
+    }
+    if is_sqlite_file(url):
+        # Seconds pysqlite waits on a locked database before raising
+        options['connect_args'] = {'timeout': env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}
+    else:
+        options['pool_pre_ping'] = True
+    return options
+
+
+def sqlite_pragmas(read_only=False):
+    """PRAGMAs applied to every new SQLite connection"""
+    pragmas = [
+        f"busy_timeout={env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)}",
+        f"mmap_size={env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        f"cache_size=-{env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024)}",
+        'temp_store=MEMORY',
+    ]
+    if read_only:
+        pragmas.append('query_only=ON')
+    else:
+        # WAL lets readers run while a booking is being written, and with
+        # synchronous=NORMAL a commit no longer waits for an fsync
+        pragmas.append('journal_mode=WAL')
+        pragmas.append(f"synchronous={os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')}")
+    return pragmas
+
+
+def install_sqlite_profile(engine, read_only=False):
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(f'PRAGMA {pragma}')
+        finally:
+            cursor.close()
+
+
+def init_database(app, url=None):
+    """Configure the database from DATABASE_URL and bind db to the app.
+
+    The default is the bundled SQLite file. File-backed SQLite gets the tuned
+    profile (WAL, synchronous=NORMAL, mmap, busy timeout) unless
+    SQLITE_PROFILE=default. A second, read-only engine is registered under the
+    'read' bind for admin queries: DATABASE_READ_URL if it is set (a replica),
+    otherwise the same SQLite file opened read-only.
+    """
+    url = url or os.getenv('DATABASE_URL') or f'sqlite:///{DEFAULT_DATABASE_PATH}'
+    tuned = os.getenv('SQLITE_PROFILE', 'tuned').lower() != 'default'
+
+    read_url = os.getenv('DATABASE_READ_URL')
+    if not read_url and is_sqlite_file(url) and tuned:
+        read_url = read_only_url(url)
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if tuned:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    if read_url:
+        app.config['SQLALCHEMY_BINDS'] = {READ_BIND: {'url': read_url, **engine_options(read_url)}}
+
+    db.init_app(app)
+
+    if tuned:
+        with app.app_context():
+            if is_sqlite_file(url):
+                install_sqlite_profile(db.engine)
+            if read_url and make_url(read_url).get_backend_name() == 'sqlite':
+                install_sqlite_profile(db.engines[READ_BIND], read_only=True)
+
+
+def read_engine():
+    """Engine for read-only admin queries, the primary engine if none is configured"""
+    return db.engines.get(READ_BIND, db.engine)
+
+
+def upsert(model, dialect_name):
+    """An INSERT with on_conflict_do_update for the dialect (PostgreSQL, else SQLite)"""
+    if dialect_name == 'postgresql':
+        # Imported on first use, SQLite deployments never load this dialect
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+@contextmanager
+def read_session():
+    """A short-lived ORM session on the read engine"""
+    session = Session(read_engine())
+    try:
+        yield session
+    finally:
+        session.close()
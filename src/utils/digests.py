@@ -0,0 +1,120 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select
+from src.models.booking import db, AdminNotification, Booking, EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class AdminDigests:
+    """New-booking notifications for admins, sent as one digest per window.
+
+    Instead of an email of its own, a booking gets an AdminNotification row,
+    added in the booking's transaction. The outbox workers flush the buffer
+    when it holds batch_size bookings or its oldest one is window seconds
+    old: the rows are taken with DELETE ... RETURNING, which hands each one
+    to exactly one flusher even across processes, and the digest is rendered
+    and queued in the outbox in the same transaction, so its delivery gets
+    the outbox's leases and retries. Bookings picked up within urgent_hours
+    skip the buffer and get the single notification right away, and a
+    window of 0 turns digests off.
+    """
+
+    def __init__(self, window=None, batch_size=None, urgent_hours=None):
+        self.window = window if window is not None else float(os.getenv('ADMIN_DIGEST_WINDOW', '900'))
+        self.batch_size = batch_size or int(os.getenv('ADMIN_DIGEST_BATCH_SIZE', '50'))
+        self.urgent_hours = urgent_hours if urgent_hours is not None else float(os.getenv('ADMIN_URGENT_HOURS', '24'))
+        # How often the workers look at the buffer
+        self.check_interval = min(self.window, 5.0)
+        self._next_check = 0.0
+
+    def init_app(self, app):
+        app.extensions['digests'] = self
+        app.cli.add_command(digests_cli)
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def is_urgent(self, booking, now=None):
+        """Whether admins must hear about a booking now: its pickup is close (or past)"""
+        pickup = datetime.combine(booking.pickup_date, booking.pickup_time)
+        return pickup - (now or datetime.now()) < timedelta(hours=self.urgent_hours)
+
+    def add(self, booking_ids):
+        """Buffer bookings for the next digest, on the current session"""
+        now = datetime.utcnow()
+        db.session.execute(
+            insert(AdminNotification),
+            [{'booking_id': booking_id, 'created_at': now} for booking_id in booking_ids]
+        )
+
+    def due(self):
+        count, oldest = db.session.execute(
+            select(func.count(), func.min(AdminNotification.created_at))
+        ).one()
+        return count >= self.batch_size or (count > 0 and oldest <= datetime.utcnow() - timedelta(seconds=self.window))
+
+    def flush_due(self, email_service):
+        """Queue digests if the buffer is due, at most every check_interval; returns the bookings sent"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return 0
+        self._next_check = now + self.check_interval
+        try:
+            due = self.due()
+            # End the read, so the flush starts its transaction with a write
+            db.session.rollback()
+            return self.flush(email_service) if due else 0
+        except Exception:
+            db.session.rollback()
+            logger.exception("Error flushing admin digest")
+            return 0
+
+    def flush(self, email_service):
+        """Queue everything buffered as digests of up to batch_size bookings, returns how many"""
+        flushed = 0
+        while True:
+            taken = db.session.scalars(
+                delete(AdminNotification)
+                .where(AdminNotification.id.in_(
+                    select(AdminNotification.id).order_by(AdminNotification.id).limit(self.batch_size)
+                ))
+                .returning(AdminNotification.booking_id)
+            ).all()
+            if not taken:
+                db.session.rollback()
+                return flushed
+
+            bookings = db.session.scalars(
+                select(Booking)
+                .where(Booking.booking_id.in_(taken))
+                .order_by(Booking.pickup_date, Booking.pickup_time, Booking.id)
+            ).all()
+            if bookings:
+                subject, html_content = email_service.templates.render_digest(bookings)
+                db.session.add(EmailOutbox(
+                    kind='admin_digest',
+                    to_email=email_service.company_email,
+                    subject=subject,
+                    html_content=html_content
+                ))
+            db.session.commit()
+            flushed += len(bookings)
+
+
+admin_digests = AdminDigests()
+
+digests_cli = AppGroup('digests', help='Admin new-booking digests')
+
+
+@digests_cli.command('flush')
+def flush_command():
+    """Queue a digest of every buffered booking now, whether or not it is due"""
+    from src.utils.email_outbox import outbox_workers
+    flushed = admin_digests.flush(outbox_workers.email_service)
+    click.echo(f'Queued {flushed} bookings in admin digests')
@@ -0,0 +1,294 @@
+import os
+import threading
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, update
+from src.models.booking import db, Booking
+from src.models.driver import Driver
+from src.utils.pricing import resolve_zone, trip_minutes, zone_distance
+
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+
+class DispatchConflict(Exception):
+    """The driver already has a trip that overlaps the booking"""
+
+    def __init__(self, driver, booking_id):
+        super().__init__(f'{driver} is already assigned to {booking_id} at that time')
+        self.driver = driver
+        self.booking_id = booking_id
+
+
+class DriverSchedule:
+    """One driver's trips as sorted, non-overlapping intervals.
+
+    Because the intervals never overlap, their ends are sorted as well, so a
+    conflict check only has to look at the last trip starting before the new
+    one ends: one bisect, O(log n).
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.trips = []  # (start, end, booking_id, dropoff_zone), sorted by start
+
+    def conflict(self, start, end, ignore=None):
+        """Return the booking_id of a trip overlapping [start, end), or None"""
+        index = bisect_left(self.starts, end)
+        while index > 0:
+            index -= 1
+            trip_start, trip_end, booking_id, _ = self.trips[index]
+            if booking_id == ignore:
+                continue
+            return booking_id if trip_end > start else None
+        return None
+
+    def add(self, start, end, booking_id, zone):
+        trip = (start, end, booking_id, zone)
+        index = bisect_left(self.trips, trip)
+        self.trips.insert(index, trip)
+        self.starts.insert(index, start)
+
+    def remove(self, booking_id):
+        for index, trip in enumerate(self.trips):
+            if trip[2] == booking_id:
+                del self.trips[index]
+                del self.starts[index]
+                return
+
+    def zone_before(self, start):
+        """Drop-off zone of the last trip ending before start"""
+        index = bisect_left(self.starts, start)
+        while index > 0:
+            index -= 1
+            if self.trips[index][1] <= start:
+                return self.trips[index][3]
+        return None
+
+
+class DispatchService:
+    """Per-driver interval indexes of the upcoming assigned trips.
+
+    The index is built from Booking on first use and afterwards only pulls
+    rows whose updated_at moved past the last one it saw (less an overlap,
+    for rows that commit late), so every process stays current with
+    assignments made elsewhere at the cost of one indexed range query.
+
+    The index is only a fast pre-filter: an assignment is checked again
+    against the table inside its write transaction, so two processes cannot
+    give one driver overlapping trips.
+    """
+
+    def __init__(self):
+        self.buffer = timedelta(minutes=int(os.getenv('DISPATCH_BUFFER_MINUTES', '30')))
+        self.horizon_days = int(os.getenv('DISPATCH_HORIZON_DAYS', '1'))
+        self.refresh_overlap = timedelta(seconds=float(os.getenv('DISPATCH_REFRESH_OVERLAP_SECONDS', '60')))
+        self.schedules = {}
+        self.assignments = {}  # booking_id -> driver name
+        self.drivers = {}
+        self.fleets = {}  # vehicle_type -> [(name, home_zone)]
+        self.watermark = None
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        app.extensions['dispatch'] = self
+
+    def trip_interval(self, booking):
+        """(start, end) a booking keeps its driver busy, including turnaround"""
+        start = datetime.combine(booking.pickup_date, booking.pickup_time)
+        minutes = trip_minutes(booking.pickup_location, booking.dropoff_location)
+        if booking.return_trip:
+            minutes *= 2
+        return start, start + timedelta(minutes=minutes) + self.buffer
+
+    def refresh(self):
+        """Catch up with bookings and drivers changed since the last refresh"""
+        with self._lock:
+            # Plain rows, so they stay usable after the request's session is gone
+            self.drivers = {
+                driver.name: driver for driver in db.session.execute(
+                    select(Driver.name, Driver.vehicle_type, Driver.home_zone).where(Driver.active.is_(True))
+                )
+            }
+            self.fleets = {}
+            for driver in self.drivers.values():
+                self.fleets.setdefault(driver.vehicle_type, []).append((driver.name, driver.home_zone))
+
+            horizon = date.today() - timedelta(days=self.horizon_days)
+            statement = select(
+                Booking.booking_id, Booking.pickup_date, Booking.pickup_time,
+                Booking.pickup_location, Booking.dropoff_location, Booking.return_trip,
+                Booking.status, Booking.driver_assigned, Booking.updated_at
+            ).where(Booking.pickup_date >= horizon)
+            if self.watermark is not None:
+                # A row can commit a little after its updated_at was set, so
+                # rows from just before the watermark are read again
+                statement = statement.where(Booking.updated_at >= self.watermark - self.refresh_overlap)
+
+            for row in db.session.execute(statement):
+                self._index(row)
+                if row.updated_at and (self.watermark is None or row.updated_at > self.watermark):
+                    self.watermark = row.updated_at
+
+    def _index(self, booking):
+        current = self.assignments.pop(booking.booking_id, None)
+        if current is not None:
+            self.schedules[current].remove(booking.booking_id)
+
+        if booking.driver_assigned and booking.status in ACTIVE_STATUSES:
+            start, end = self.trip_interval(booking)
+            schedule = self.schedules.setdefault(booking.driver_assigned, DriverSchedule())
+            schedule.add(start, end, booking.booking_id, resolve_zone(booking.dropoff_location))
+            self.assignments[booking.booking_id] = booking.driver_assigned
+
+    def conflict(self, driver_name, booking):
+        """booking_id of the driver's trip that overlaps booking, or None"""
+        schedule = self.schedules.get(driver_name)
+        if schedule is None:
+            return None
+        start, end = self.trip_interval(booking)
+        return schedule.conflict(start, end, ignore=booking.booking_id)
+
+    def suggest(self, booking, limit=3):
+        """Free drivers for a booking, nearest first, as (driver, miles away) pairs"""
+        with self._lock:
+            start, end = self.trip_interval(booking)
+            pickup_zone = resolve_zone(booking.pickup_location)
+            candidates = []
+            for name, zone in self.fleets.get(booking.vehicle_type, ()):
+                schedule = self.schedules.get(name)
+                if schedule is not None:
+                    if schedule.conflict(start, end, ignore=booking.booking_id):
+                        continue
+                    zone = schedule.zone_before(start) or zone
+                candidates.append((zone_distance(zone, pickup_zone), name))
+            candidates.sort()
+            return [(self.drivers[name], miles) for miles, name in candidates[:limit]]
+
+    def assign(self, booking, driver_name):
+        """Assign a driver to a booking and commit, raises DispatchConflict on overlap"""
+        with self._lock:
+            self.refresh()
+            if booking.status not in ACTIVE_STATUSES:
+                raise ValueError(f'Cannot assign a driver to a {booking.status} booking')
+            if driver_name not in self.drivers:
+                raise ValueError(f'Unknown or inactive driver: {driver_name}')
+            conflicting = self.conflict(driver_name, booking)
+            if conflicting:
+                raise DispatchConflict(driver_name, conflicting)
+
+            # End the read, so the transaction starts with the write
+            db.session.rollback()
+            booking.driver_assigned = driver_name
+            try:
+                db.session.flush()
+                self._lock_drivers([driver_name])
+                db.session.refresh(booking)
+                if booking.status not in ACTIVE_STATUSES:
+                    raise ValueError(f'Cannot assign a driver to a {booking.status} booking')
+                self._check_table([(booking, driver_name)])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.refresh()
+                raise
+            self._index(booking)
+
+    def _lock_drivers(self, driver_names):
+        """Hold the drivers until commit: on SQLite the write already holds the
+        database, elsewhere this locks the drivers' rows (in name order)"""
+        db.session.execute(
+            select(Driver.id).where(Driver.name.in_(driver_names)).order_by(Driver.name).with_for_update()
+        )
+
+    def _check_table(self, assignments):
+        """Check written (booking, driver name) assignments against the table.
+
+        Runs in the write transaction, after the drivers are locked, so it
+        sees every assignment committed by other processes; raises
+        DispatchConflict for the first overlap.
+        """
+        intervals = [(booking, driver, self.trip_interval(booking)) for booking, driver in assignments]
+        # A trip from the day before can run past midnight
+        first = min(start for _, _, (start, _) in intervals).date() - timedelta(days=1)
+        last = max(end for _, _, (_, end) in intervals).date()
+        trips = {}
+        for row in db.session.execute(
+            select(
+                Booking.booking_id, Booking.pickup_date, Booking.pickup_time,
+                Booking.pickup_location, Booking.dropoff_location, Booking.return_trip,
+                Booking.driver_assigned
+            ).where(
+                Booking.driver_assigned.in_({driver for _, driver, _ in intervals}),
+                Booking.status.in_(ACTIVE_STATUSES),
+                Booking.pickup_date.between(first, last)
+            )
+        ):
+            trips.setdefault(row.driver_assigned, []).append((*self.trip_interval(row), row.booking_id))
+
+        for booking, driver, (start, end) in intervals:
+            for trip_start, trip_end, booking_id in trips.get(driver, ()):
+                if booking_id != booking.booking_id and trip_start < end and trip_end > start:
+                    raise DispatchConflict(driver, booking_id)
+
+    def auto_assign(self, day):
+        """Assign the nearest free driver to every unassigned booking of a day.
+
+        Returns (assigned, unassigned) lists of (booking_id, driver name or None).
+        All assignments are written with one bulk UPDATE and one commit.
+        """
+        with self._lock:
+            self.refresh()
+            bookings = db.session.execute(
+                select(
+                    Booking.id, Booking.booking_id, Booking.pickup_date, Booking.pickup_time,
+                    Booking.pickup_location, Booking.dropoff_location, Booking.return_trip,
+                    Booking.vehicle_type, Booking.status
+                )
+                .where(
+                    Booking.pickup_date == day,
+                    Booking.status.in_(ACTIVE_STATUSES),
+                    Booking.driver_assigned.is_(None)
+                )
+                .order_by(Booking.pickup_time, Booking.id)
+            ).all()
+
+            assigned, unassigned, changes, written = [], [], [], []
+            for booking in bookings:
+                suggestions = self.suggest(booking, limit=1)
+                if not suggestions:
+                    unassigned.append((booking.booking_id, None))
+                    continue
+                driver = suggestions[0][0]
+                start, end = self.trip_interval(booking)
+                self.schedules.setdefault(driver.name, DriverSchedule()).add(
+                    start, end, booking.booking_id, resolve_zone(booking.dropoff_location)
+                )
+                self.assignments[booking.booking_id] = driver.name
+                assigned.append((booking.booking_id, driver.name))
+                written.append((booking, driver.name))
+                changes.append({'id': booking.id, 'driver_assigned': driver.name, 'updated_at': datetime.utcnow()})
+
+            if changes:
+                # End the read, so the transaction starts with the write
+                db.session.rollback()
+                try:
+                    db.session.execute(update(Booking), changes)
+                    self._lock_drivers({driver for _, driver in assigned})
+                    self._check_table(written)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    # Drop the in-memory assignments too and rebuild from the table
+                    self.reset()
+                    raise
+            return assigned, unassigned
+
+    def reset(self):
+        with self._lock:
+            self.schedules = {}
+            self.assignments = {}
+            self.watermark = None
+            self.refresh()
+
+
+dispatch_service = DispatchService()
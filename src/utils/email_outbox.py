@@ -0,0 +1,244 @@
+import logging
+import os
+import random
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, update
+from src.models.booking import db, EmailOutbox
+from src.utils.digests import admin_digests
+from src.utils.email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPSession:
+    """A long-lived SMTP connection owned by a single worker thread"""
+
+    def __init__(self, email_service, max_idle=60, max_messages=100):
+        self.email_service = email_service
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self.connection = None
+        self.messages_sent = 0
+        self.last_used = 0.0
+
+    def get(self):
+        """Return an open connection, reconnecting if it went idle or stale"""
+        if self.connection is not None:
+            expired = (
+                time.monotonic() - self.last_used > self.max_idle
+                or self.messages_sent >= self.max_messages
+            )
+            if expired or not self._is_alive():
+                self.close()
+
+        if self.connection is None:
+            self.connection = self.email_service.open_connection()
+            self.messages_sent = 0
+        return self.connection
+
+    def send(self, to_email, subject, html_content):
+        connection = self.get()
+        try:
+            self.email_service.deliver(to_email, subject, html_content, connection=connection)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError):
+            # The server went away under us, the next message gets a fresh connection
+            self.close()
+            raise
+        self.messages_sent += 1
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.quit()
+        except Exception:
+            self.connection.close()
+        self.connection = None
+
+    def _is_alive(self):
+        try:
+            return self.connection.noop()[0] == 250
+        except Exception:
+            return False
+
+
+class OutboxWorkerPool:
+    """Background threads that drain the email outbox.
+
+    Messages are claimed with a lease, so several workers (and several
+    processes) can share one outbox without sending anything twice. Failed
+    deliveries are retried with exponential backoff until max_attempts.
+    """
+
+    def __init__(self, email_service=None):
+        self.email_service = email_service or EmailService()
+        self.workers = int(os.getenv('EMAIL_WORKERS', '2'))
+        self.batch_size = int(os.getenv('EMAIL_BATCH_SIZE', '20'))
+        self.poll_interval = float(os.getenv('EMAIL_POLL_INTERVAL', '2'))
+        self.max_attempts = int(os.getenv('EMAIL_MAX_ATTEMPTS', '5'))
+        self.retry_backoff = float(os.getenv('EMAIL_RETRY_BACKOFF', '30'))
+        self.max_backoff = float(os.getenv('EMAIL_MAX_BACKOFF', '3600'))
+        self.lease_seconds = float(os.getenv('EMAIL_LEASE_SECONDS', '300'))
+        self.app = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['email_outbox'] = self
+
+    def start(self):
+        """Start the worker threads (no-op when EMAIL_WORKERS is 0)"""
+        if self._threads or self.workers <= 0:
+            return
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                name=f'email-outbox-{index}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake the workers up, e.g. right after a booking was committed"""
+        self._wakeup.set()
+
+    def drain(self, session=None):
+        """Deliver everything that is currently due, returns the number processed"""
+        owns_session = session is None
+        session = session or SMTPSession(self.email_service)
+        total = 0
+        try:
+            while True:
+                processed = self.run_once(session)
+                if not processed:
+                    return total
+                total += processed
+        finally:
+            if owns_session:
+                session.close()
+
+    def run_once(self, session):
+        """Claim one batch of due messages and try to deliver them"""
+        # A due admin digest is queued first, so it goes out in this batch
+        admin_digests.flush_due(self.email_service)
+        token, messages = self._claim_batch()
+        for message in messages:
+            try:
+                session.send(message.to_email, message.subject, message.html_content)
+            except Exception as e:
+                self._mark_failed(message, token, e)
+            else:
+                self._mark_sent(message, token)
+        return len(messages)
+
+    def _run(self):
+        session = SMTPSession(self.email_service)
+        with self.app.app_context():
+            while not self._stopping.is_set():
+                try:
+                    processed = self.run_once(session)
+                except Exception:
+                    logger.exception("Error in email outbox worker")
+                    db.session.rollback()
+                    processed = 0
+                finally:
+                    db.session.remove()
+
+                if not processed:
+                    if self._wakeup.wait(self.poll_interval):
+                        self._wakeup.clear()
+        session.close()
+
+    def _claim_batch(self):
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        due = or_(
+            and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+            # Leases of workers that died mid-send run out and are picked up again
+            and_(EmailOutbox.status == 'sending', EmailOutbox.locked_until < now),
+        )
+        candidates = (
+            db.session.query(EmailOutbox.id)
+            .filter(due)
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+            .limit(self.batch_size)
+            .subquery()
+        )
+        db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(db.select(candidates.c.id)), due)
+            .values(
+                status='sending',
+                lease_token=token,
+                locked_until=now + timedelta(seconds=self.lease_seconds)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        # Plain rows rather than instances, so committing one result does not
+        # expire (and reload) the rest of the batch
+        messages = (
+            db.session.query(
+                EmailOutbox.id,
+                EmailOutbox.to_email,
+                EmailOutbox.subject,
+                EmailOutbox.html_content,
+                EmailOutbox.attempts
+            )
+            .filter_by(lease_token=token, status='sending')
+            .order_by(EmailOutbox.id)
+            .all()
+        )
+        return token, messages
+
+    def _mark_sent(self, message, token):
+        self._finish(message, token, status='sent', sent_at=datetime.utcnow(), last_error=None)
+
+    def _mark_failed(self, message, token, error):
+        attempts = message.attempts + 1
+        permanent = isinstance(error, smtplib.SMTPRecipientsRefused)
+        if permanent or attempts >= self.max_attempts:
+            logger.error("Giving up on email %s to %s", message.id, message.to_email, exc_info=error)
+            self._finish(message, token, status='failed', attempts=attempts, last_error=str(error))
+            return
+
+        delay = min(self.retry_backoff * (2 ** (attempts - 1)), self.max_backoff)
+        delay *= random.uniform(0.8, 1.2)
+        self._finish(
+            message,
+            token,
+            status='pending',
+            attempts=attempts,
+            last_error=str(error),
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+
+    def _finish(self, message, token, **values):
+        # Only the lease holder may settle the message
+        db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id == message.id, EmailOutbox.lease_token == token)
+            .values(lease_token=None, locked_until=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+
+outbox_workers = OutboxWorkerPool()
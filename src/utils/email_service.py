@@ -1,183 +1,224 @@
+import logging
 import smtplib
 import os
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import insert
+from src.models.booking import db, EmailOutbox
+from src.utils.digests import admin_digests
+from src.utils.email_templates import EmailTemplates
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 class EmailService:
     def __init__(self):
         self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
         self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
+        self.smtp_use_tls = os.getenv('SMTP_USE_TLS', 'True').lower() in ('1', 'true', 'yes')
+        self.smtp_timeout = float(os.getenv('SMTP_TIMEOUT', '30'))
         self.email_user = os.getenv('EMAIL_USER', 'your-email@gmail.com')
         self.email_password = os.getenv('EMAIL_PASSWORD', 'your-app-password')
         self.company_email = os.getenv('COMPANY_EMAIL', 'bookings@zoomgorides.com')
+        # "console" only prints emails (demo), "smtp" delivers them
+        self.backend = os.getenv('EMAIL_BACKEND', 'console').lower()
+        # Compiled on first render, so importing the app does not pay for it
+        self._templates = None
+        self._templates_lock = threading.Lock()
+
+    @property
+    def templates(self):
+        if self._templates is None:
+            with self._templates_lock:
+                if self._templates is None:
+                    self._templates = EmailTemplates()
+        return self._templates
         
     def send_booking_confirmation(self, booking):
         """Send booking confirmation email to customer"""
         try:
-            subject = f"Booking Confirmation - {booking.booking_id}"
-            
-            # Create HTML email content
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #003366; color: white; padding: 20px; text-align: center; }}
-                    .content {{ padding: 20px; background-color: #f9f9f9; }}
-                    .booking-details {{ background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }}
-                    .footer {{ background-color: #003366; color: white; padding: 15px; text-align: center; font-size: 12px; }}
-                    .status {{ background-color: #ffc107; color: #856404; padding: 5px 10px; border-radius: 3px; display: inline-block; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>Zoom & Go Rides</h1>
-                        <h2>Booking Confirmation</h2>
-                    </div>
-                    
-                    <div class="content">
-                        <p>Dear {booking.first_name} {booking.last_name},</p>
-                        
-                        <p>Thank you for choosing Zoom & Go Rides! Your booking has been received and is currently being processed.</p>
-                        
-                        <div class="booking-details">
-                            <h3>Booking Details</h3>
-                            <p><strong>Booking ID:</strong> {booking.booking_id}</p>
-                            <p><strong>Status:</strong> <span class="status">{booking.status.upper()}</span></p>
-                            <p><strong>Service:</strong> {booking.service_type.replace('_', ' ').title()}</p>
-                            <p><strong>Vehicle:</strong> {booking.vehicle_type.replace('_', ' ').title()}</p>
-                            <p><strong>Date & Time:</strong> {booking.pickup_date} at {booking.pickup_time}</p>
-                            <p><strong>Pickup Location:</strong> {booking.pickup_location}</p>
-                            <p><strong>Drop-off Location:</strong> {booking.dropoff_location}</p>
-                            <p><strong>Passengers:</strong> {booking.passengers}</p>
-                            {f'<p><strong>Estimated Price:</strong> ${booking.estimated_price:.2f}</p>' if booking.estimated_price else ''}
-                            {f'<p><strong>Special Requests:</strong> {booking.special_requests}</p>' if booking.special_requests else ''}
-                        </div>
-                        
-                        <p><strong>What's Next?</strong></p>
-                        <ul>
-                            <li>Our team will review your booking within 2 hours</li>
-                            <li>You will receive a confirmation call or email with final details</li>
-                            <li>A driver will be assigned and you'll receive their contact information</li>
-                        </ul>
-                        
-                        <p>If you have any questions or need to make changes, please contact us:</p>
-                        <p>📞 Phone: +1 (555) 123-4567<br>
-                        📧 Email: bookings@zoomgorides.com</p>
-                    </div>
-                    
-                    <div class="footer">
-                        <p>&copy; 2025 Zoom & Go Rides. All rights reserved.</p>
-                        <p>123 Transportation Ave, Dallas, TX 75201</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
+            subject, html_content = self.render_booking_confirmation(booking)
             return self._send_email(booking.email, subject, html_content)
             
-        except Exception as e:
-            print(f"Error sending booking confirmation: {str(e)}")
+        except Exception:
+            logger.exception("Error sending booking confirmation")
             return False
     
     def send_admin_notification(self, booking):
         """Send new booking notification to admin"""
         try:
-            subject = f"New Booking Received - {booking.booking_id}"
-            
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #dc3545; color: white; padding: 20px; text-align: center; }}
-                    .content {{ padding: 20px; background-color: #f9f9f9; }}
-                    .booking-details {{ background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }}
-                    .urgent {{ background-color: #ff6b6b; color: white; padding: 10px; border-radius: 5px; margin: 10px 0; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🚨 New Booking Alert</h1>
-                    </div>
-                    
-                    <div class="content">
-                        <div class="urgent">
-                            <strong>Action Required:</strong> New booking needs review and confirmation
-                        </div>
-                        
-                        <div class="booking-details">
-                            <h3>Booking Information</h3>
-                            <p><strong>Booking ID:</strong> {booking.booking_id}</p>
-                            <p><strong>Customer:</strong> {booking.first_name} {booking.last_name}</p>
-                            <p><strong>Email:</strong> {booking.email}</p>
-                            <p><strong>Phone:</strong> {booking.phone}</p>
-                            <p><strong>Service:</strong> {booking.service_type.replace('_', ' ').title()}</p>
-                            <p><strong>Vehicle:</strong> {booking.vehicle_type.replace('_', ' ').title()}</p>
-                            <p><strong>Date & Time:</strong> {booking.pickup_date} at {booking.pickup_time}</p>
-                            <p><strong>Pickup:</strong> {booking.pickup_location}</p>
-                            <p><strong>Drop-off:</strong> {booking.dropoff_location}</p>
-                            <p><strong>Passengers:</strong> {booking.passengers}</p>
-                            <p><strong>Estimated Price:</strong> ${booking.estimated_price:.2f}</p>
-                            <p><strong>Submitted:</strong> {booking.created_at.strftime('%Y-%m-%d %H:%M:%S')}</p>
-                            {f'<p><strong>Special Requests:</strong> {booking.special_requests}</p>' if booking.special_requests else ''}
-                        </div>
-                        
-                        <p><strong>Next Steps:</strong></p>
-                        <ul>
-                            <li>Review booking details</li>
-                            <li>Confirm availability</li>
-                            <li>Assign driver</li>
-                            <li>Contact customer for confirmation</li>
-                        </ul>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
+            subject, html_content = self.render_admin_notification(booking)
             return self._send_email(self.company_email, subject, html_content)
             
-        except Exception as e:
-            print(f"Error sending admin notification: {str(e)}")
+        except Exception:
+            logger.exception("Error sending admin notification")
             return False
-    
-    def _send_email(self, to_email, subject, html_content):
-        """Send email using SMTP"""
+
+    def queue_booking_emails(self, booking):
+        """Add the customer and admin emails for a booking to the outbox.
+
+        The rows are only added to the current session, so they are committed
+        or rolled back together with the booking itself. Admins get their own
+        email only for urgent bookings, the others wait for the next digest.
+        """
+        emails = [('booking_confirmation', booking.email, self.render_booking_confirmation)]
+        if admin_digests.enabled and not admin_digests.is_urgent(booking):
+            admin_digests.add([booking.booking_id])
+        else:
+            emails.append(('admin_notification', self.company_email, self.render_admin_notification))
+
+        queued = []
+        for kind, to_email, render in emails:
+            try:
+                subject, html_content = render(booking)
+            except Exception:
+                logger.exception("Error rendering %s for %s", kind, booking.booking_id)
+                continue
+
+            message = EmailOutbox(
+                booking_id=booking.booking_id,
+                kind=kind,
+                to_email=to_email,
+                subject=subject,
+                html_content=html_content
+            )
+            db.session.add(message)
+            queued.append(message)
+        return queued
+
+    def queue_many(self, bookings):
+        """Bulk version of queue_booking_emails for booking rows (dicts).
+
+        Each kind of email is rendered for the whole batch at once and all
+        outbox rows go in with a single INSERT on the current session.
+        """
+        now = datetime.utcnow()
+        bookings = [SimpleNamespace(**booking) for booking in bookings]
+        urgent = bookings
+        if admin_digests.enabled:
+            urgent, digested = [], []
+            for booking in bookings:
+                (urgent if admin_digests.is_urgent(booking) else digested).append(booking)
+            if digested:
+                admin_digests.add(booking.booking_id for booking in digested)
+
+        messages = []
+        for kind, to_email, batch in (
+            ('booking_confirmation', None, bookings),
+            ('admin_notification', self.company_email, urgent),
+        ):
+            if not batch:
+                continue
+            for booking, rendered in zip(batch, self._render_batch(kind, batch)):
+                if rendered is None:
+                    continue
+                subject, html_content = rendered
+                messages.append({
+                    'booking_id': booking.booking_id,
+                    'kind': kind,
+                    'to_email': to_email or booking.email,
+                    'subject': subject,
+                    'html_content': html_content,
+                    'status': 'pending',
+                    'attempts': 0,
+                    'next_attempt_at': now,
+                    'created_at': now
+                })
+
+        if messages:
+            db.session.execute(insert(EmailOutbox), messages)
+        return len(messages)
+
+    def _render_batch(self, kind, bookings):
+        try:
+            return self.render_many(bookings, kind)
+        except Exception:
+            # Fall back to one by one so a single bad booking only loses its own email
+            rendered = []
+            for booking in bookings:
+                try:
+                    rendered.append(self.templates.render(kind, booking))
+                except Exception:
+                    logger.exception("Error rendering %s for %s", kind, booking.booking_id)
+                    rendered.append(None)
+            return rendered
+
+    def render_booking_confirmation(self, booking):
+        """Render the customer confirmation email, returns (subject, html)"""
+        return self.templates.render('booking_confirmation', booking)
+
+    def render_admin_notification(self, booking):
+        """Render the new booking notification for admins, returns (subject, html)"""
+        return self.templates.render('admin_notification', booking)
+
+    def render_many(self, bookings, kind='booking_confirmation'):
+        """Render the same kind of email for many bookings, returns a list of (subject, html)"""
+        return self.templates.render_many(kind, bookings)
+
+    def open_connection(self):
+        """Open an authenticated SMTP connection, or None for the console backend"""
+        if self.backend != 'smtp':
+            return None
+
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
         try:
+            if self.smtp_use_tls:
+                server.starttls()
+            if self.email_password:
+                server.login(self.email_user, self.email_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def build_message(self, to_email, subject, html_content):
+        """Build the MIME message for an email"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = self.email_user
+        msg['To'] = to_email
+
+        html_part = MIMEText(html_content, 'html')
+        msg.attach(html_part)
+        return msg
+
+    def deliver(self, to_email, subject, html_content, connection=None):
+        """Deliver an email, raising on failure.
+
+        An open connection from open_connection() is reused as is, otherwise
+        a connection is opened just for this message.
+        """
+        with metrics.time_email_send(self.backend):
+            self._deliver(to_email, subject, html_content, connection)
+
+    def _deliver(self, to_email, subject, html_content, connection):
+        if self.backend != 'smtp':
             # For demo purposes, we'll just print the email content
-            # In production, you would configure actual SMTP settings
             print(f"📧 EMAIL SENT TO: {to_email}")
             print(f"📧 SUBJECT: {subject}")
             print(f"📧 CONTENT: {html_content[:200]}...")
-            return True
-            
-           msg = MIMEMultipart('alternative')
-msg['Subject'] = subject
-msg['From'] = self.email_user
-msg['To'] = to_email
+            return
 
-html_part = MIMEText(html_content, 'html')
-msg.attach(html_part)
+        msg = self.build_message(to_email, subject, html_content)
+        if connection is not None:
+            connection.send_message(msg)
+            return
 
-server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-server.starttls()
-server.login(self.email_user, self.email_password)
-server.send_message(msg)
-server.quit()
+        server = self.open_connection()
+        try:
+            server.send_message(msg)
+        finally:
+            server.quit()
 
-return True
+    def _send_email(self, to_email, subject, html_content):
+        """Send email using SMTP"""
+        try:
+            self.deliver(to_email, subject, html_content)
+            return True
 
-            
-        except Exception as e:
-            print(f"Error in _send_email: {str(e)}")
+        except Exception:
+            logger.exception("Error sending email to %s", to_email)
             return False
-
@@ -0,0 +1,105 @@
+import os
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+from markupsafe import Markup
+from src.utils.metrics import metrics
+
+TEMPLATE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+
+# Stands in for the message body while the static shell is rendered
+BODY_PLACEHOLDER = '<!--@@EMAIL_BODY@@-->'
+
+# Separates the bodies in a batch render; booking data is escaped, so it can
+# never produce this marker itself
+BATCH_SEPARATOR = '<!--@@EMAIL_SPLIT@@-->'
+
+
+def label(value):
+    """Turn a stored value like 'airport_transfer' into 'Airport Transfer'"""
+    return str(value).replace('_', ' ').title()
+
+
+class EmailTemplates:
+    """Compiled email templates.
+
+    Every email is a static shell (layout, CSS, header, footer) around a
+    per-booking body. The shells never change, so they are rendered once here
+    and split around the body; sending an email only renders the body template.
+    The admin digest is the one email whose body lists many bookings.
+    """
+
+    KINDS = {
+        'booking_confirmation': 'Booking Confirmation - {booking_id}',
+        'admin_notification': 'New Booking Received - {booking_id}',
+    }
+
+    DIGEST_SUBJECT = 'New Bookings Digest - {count} booking{plural}'
+
+    def __init__(self, template_folder=TEMPLATE_FOLDER):
+        self.env = Environment(
+            loader=FileSystemLoader(template_folder),
+            autoescape=select_autoescape(['html']),
+            undefined=StrictUndefined,
+            auto_reload=False
+        )
+        self.env.filters['label'] = label
+        # Every render copies the globals into its context; the email
+        # templates use none of them (range, dict, lipsum, ...)
+        self.env.globals.clear()
+
+        self.shells = {}
+        self.bodies = {}
+        self.batches = {}
+        for kind in self.KINDS:
+            self.shells[kind] = self._shell(kind)
+            self.bodies[kind] = self.env.get_template(f'email/{kind}.html')
+
+            # The same body wrapped in a loop, so a batch is a single render call
+            source = self.env.loader.get_source(self.env, f'email/{kind}.html')[0]
+            if source.endswith('\n'):
+                # Jinja drops the file's trailing newline, keep the output identical
+                source = source[:-1]
+            self.batches[kind] = self.env.from_string(
+                '{% for booking in bookings %}' + source + BATCH_SEPARATOR + '{% endfor %}'
+            )
+
+        self.shells['admin_digest'] = self._shell('admin_digest')
+        self.bodies['admin_digest'] = self.env.get_template('email/admin_digest.html')
+
+    def _shell(self, kind):
+        """The rendered shell of a kind, as (head, tail) around the body"""
+        shell = self.env.get_template(f'email/{kind}_shell.html').render(
+            content=Markup(BODY_PLACEHOLDER)
+        )
+        head, tail = shell.split(BODY_PLACEHOLDER)
+        return head, tail
+
+    def render(self, kind, booking):
+        """Render one email, returns (subject, html)"""
+        head, tail = self.shells[kind]
+        with metrics.time_email_render(kind, 'single'):
+            body = self.bodies[kind].render(booking=booking)
+        subject = self.KINDS[kind].format(booking_id=booking.booking_id)
+        return subject, head + body + tail
+
+    def render_many(self, kind, bookings):
+        """Render one email per booking, returns a list of (subject, html)"""
+        bookings = list(bookings)
+        if not bookings:
+            return []
+
+        head, tail = self.shells[kind]
+        subject = self.KINDS[kind]
+        with metrics.time_email_render(kind, 'batch', len(bookings)):
+            bodies = self.batches[kind].render(bookings=bookings).split(BATCH_SEPARATOR)
+        return [
+            (subject.format(booking_id=booking.booking_id), head + body + tail)
+            for booking, body in zip(bookings, bodies)
+        ]
+
+    def render_digest(self, bookings):
+        """Render one admin email listing many new bookings, returns (subject, html)"""
+        head, tail = self.shells['admin_digest']
+        with metrics.time_email_render('admin_digest', 'digest', len(bookings)):
+            body = self.bodies['admin_digest'].render(bookings=bookings)
+        subject = self.DIGEST_SUBJECT.format(count=len(bookings), plural='' if len(bookings) == 1 else 's')
+        return subject, head + body + tail
@@ -0,0 +1,96 @@
+import csv
+import heapq
+import io
+import json
+from itertools import chain
+from datetime import date, datetime, time
+from sqlalchemy import select
+from src.models.booking import db, Booking
+
+EXPORT_BATCH_SIZE = 1000
+
+# Same fields, order and formats as Booking.to_dict()
+EXPORT_COLUMNS = list(Booking.__table__.columns)
+EXPORT_FIELDS = [column.name for column in EXPORT_COLUMNS]
+
+
+def _row_formatter():
+    # Look the converter of each column up once instead of type-checking every value
+    converters = []
+    for column in EXPORT_COLUMNS:
+        python_type = column.type.python_type
+        if python_type is time:
+            converters.append(lambda value: value.strftime('%H:%M') if value is not None else None)
+        elif python_type in (date, datetime):
+            converters.append(lambda value: value.isoformat() if value is not None else None)
+        else:
+            converters.append(None)
+
+    def format_row(row):
+        return [
+            convert(value) if convert else value
+            for convert, value in zip(converters, row)
+        ]
+    return format_row
+
+
+def export_statement(conditions):
+    """Column-projected SELECT for an export, no ORM instances are built"""
+    return (
+        select(*EXPORT_COLUMNS)
+        .where(*conditions)
+        .order_by(Booking.pickup_date, Booking.id)
+    )
+
+
+def iter_batches(statement, batch_size=EXPORT_BATCH_SIZE, engine=None):
+    """Yield lists of rows, fetching batch_size rows at a time from the server side cursor"""
+    with (engine or db.engine).connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(statement)
+        for rows in result.partitions():
+            yield rows
+
+
+def merge_rows(batches, rows, batch_size=EXPORT_BATCH_SIZE):
+    """Merge more rows into a stream of batches, both in (pickup_date, id) order"""
+    pickup_date = EXPORT_FIELDS.index('pickup_date')
+    booking_pk = EXPORT_FIELDS.index('id')
+    merged = heapq.merge(
+        chain.from_iterable(batches), rows,
+        key=lambda row: (row[pickup_date], row[booking_pk])
+    )
+    batch = []
+    for row in merged:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_ndjson(batches):
+    """Yield newline-delimited JSON, one chunk per batch"""
+    format_row = _row_formatter()
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    fields = EXPORT_FIELDS
+    for rows in batches:
+        yield ''.join(
+            dumps(dict(zip(fields, format_row(row)))) + '\n'
+            for row in rows
+        )
+
+
+def stream_csv(batches):
+    """Yield CSV with a header row, one chunk per batch"""
+    format_row = _row_formatter()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in batches:
+        writer.writerows(format_row(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from flask import request
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from src.models.booking import db, IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 128
+
+StoredResponse = namedtuple('StoredResponse', ['fingerprint', 'status_code', 'body'])
+
+
+def request_fingerprint():
+    """Hash of what makes a request the same request: method, path and raw body"""
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Responses of requests sent with an Idempotency-Key, kept for ttl.
+
+    The key row is inserted as the first write of the request's transaction,
+    so a concurrent retry with the same key waits for it and then fails on
+    the primary key instead of doing the work twice. Completed responses are
+    also kept in an in-process LRU cache, so a retry usually costs a dict
+    lookup; other processes fall back to one primary key read. A background
+    thread deletes expired rows.
+    """
+
+    def __init__(self, ttl=None, cache_size=None, sweep_interval=None):
+        self.ttl = timedelta(seconds=ttl if ttl is not None else float(os.getenv('IDEMPOTENCY_TTL', str(24 * 3600))))
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000'))
+        self.sweep_interval = sweep_interval if sweep_interval is not None else float(os.getenv('IDEMPOTENCY_SWEEP_INTERVAL', '300'))
+        self.app = None
+        self._cache = OrderedDict()  # key -> (monotonic expiry, StoredResponse)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['idempotency'] = self
+
+    def lookup(self, key):
+        """The stored response for a key, or None if there is none (or it expired)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._cache.move_to_end(key)
+                    return entry[1]
+                del self._cache[key]
+
+        row = db.session.execute(
+            select(IdempotencyKey.fingerprint, IdempotencyKey.status_code,
+                   IdempotencyKey.response_body, IdempotencyKey.expires_at)
+            .where(IdempotencyKey.key == key)
+        ).first()
+        if row is None or row.status_code is None or row.expires_at <= datetime.utcnow():
+            return None
+        stored = StoredResponse(row.fingerprint, row.status_code, json.loads(row.response_body))
+        self._remember(key, stored, (row.expires_at - datetime.utcnow()).total_seconds())
+        return stored
+
+    def claim(self, key, fingerprint):
+        """Insert the key, raises IntegrityError if it is taken, returns the row.
+
+        Must be the first write of the transaction: when the key is only held
+        by an expired row the sweeper has not deleted yet, the transaction is
+        rolled back, that row deleted and the key claimed again.
+        """
+        now = datetime.utcnow()
+        row = IdempotencyKey(key=key, fingerprint=fingerprint, created_at=now, expires_at=now + self.ttl)
+        db.session.add(row)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            deleted = db.session.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at <= now)
+            ).rowcount
+            if not deleted:
+                raise
+            row = IdempotencyKey(key=key, fingerprint=fingerprint, created_at=now, expires_at=now + self.ttl)
+            db.session.add(row)
+            db.session.flush()
+        return row
+
+    def complete(self, row, status_code, body):
+        """Store the response on a claimed key row, in the current transaction"""
+        row.status_code = status_code
+        row.response_body = json.dumps(body)
+
+    def remember(self, key, fingerprint, status_code, body):
+        """Cache a response once its transaction has been committed"""
+        self._remember(key, StoredResponse(fingerprint, status_code, body), self.ttl.total_seconds())
+
+    def _remember(self, key, stored, ttl):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl, stored)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def sweep(self, batch_size=1000):
+        """Delete expired keys in small batches, returns the number deleted"""
+        total = 0
+        while True:
+            expired = (
+                select(IdempotencyKey.key)
+                .where(IdempotencyKey.expires_at <= datetime.utcnow())
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            deleted = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.key.in_(expired))).rowcount
+            db.session.commit()
+            total += deleted
+            if deleted < batch_size:
+                return total
+
+    def start(self):
+        """Start the background sweeper (no-op when IDEMPOTENCY_SWEEP_INTERVAL is 0)"""
+        if self._thread or self.sweep_interval <= 0:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='idempotency-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stopping.wait(self.sweep_interval):
+                try:
+                    self.sweep()
+                except Exception:
+                    logger.exception("Error sweeping idempotency keys")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+idempotency_keys = IdempotencyStore()
@@ -0,0 +1,239 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Seconds, from a cached lookup to a slow export
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic counter per label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f'{self.name}{format_labels(self.labels, label_values)} {format_number(value)}'
+
+
+class Histogram:
+    """Bucketed observations per label values, exported the Prometheus way"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def samples(self):
+        with self._lock:
+            series = sorted((label_values, list(values)) for label_values, values in self._series.items())
+        for label_values, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                le = f'le="{format_number(float(bound))}"'
+                yield f'{self.name}_bucket{format_labels(self.labels, label_values, le)} {cumulative}'
+            labels = format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {format_number(values[-1])}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Metrics:
+    """In-process metrics registry and request instrumentation.
+
+    Every request is timed per route, method and status, and the SQL
+    statements it runs (counted through SQLAlchemy events on each of the
+    app's engines) are recorded per route too. Streamed responses are timed
+    up to the moment their headers are ready, so the time spent producing
+    and sending the body is not included. Collection is a bisect and a short lock per
+    observation, cheap enough to leave on; METRICS_ENABLED=0 turns it off and
+    the enabled attribute pauses it at runtime. Values are kept per process,
+    so with several workers each one is scraped on its own.
+    """
+
+    def __init__(self, enabled=None):
+        self.enabled = enabled if enabled is not None else os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+        self.families = []
+
+        self.request_duration = self.histogram(
+            'http_request_duration_seconds', 'Time spent handling a request',
+            ('method', 'route', 'status')
+        )
+        self.request_sql_statements = self.histogram(
+            'http_request_sql_statements', 'SQL statements executed per request',
+            ('route',), buckets=COUNT_BUCKETS
+        )
+        self.request_sql_duration = self.histogram(
+            'http_request_sql_duration_seconds', 'Time spent in SQL per request', ('route',)
+        )
+        self.sql_duration = self.histogram(
+            'db_statement_duration_seconds', 'Time spent executing one SQL statement', ('operation',)
+        )
+        self.email_render_duration = self.histogram(
+            'email_render_duration_seconds', 'Time spent rendering email templates (one call, single or batch)',
+            ('kind', 'mode')
+        )
+        self.emails_rendered = self.counter(
+            'email_rendered_total', 'Emails rendered', ('kind',)
+        )
+        self.email_send_duration = self.histogram(
+            'email_send_duration_seconds', 'Time spent delivering one email', ('backend', 'outcome')
+        )
+
+    def counter(self, name, documentation, labels=()):
+        family = Counter(name, documentation, labels)
+        self.families.append(family)
+        return family
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        family = Histogram(name, documentation, labels, buckets)
+        self.families.append(family)
+        return family
+
+    def init_app(self, app):
+        """Instrument an app and its engines, call it after the database is configured"""
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        from src.models.booking import db
+        with app.app_context():
+            for engine in db.engines.values():
+                if not event.contains(engine, 'before_cursor_execute', self._before_cursor_execute):
+                    event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                    event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_request(self):
+        if not self.enabled:
+            return
+        g._metrics = [time.perf_counter(), 0, 0.0]  # start, statements, SQL seconds
+
+    def _after_request(self, response):
+        state = g.pop('_metrics', None)
+        if state is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            self.request_duration.observe(time.perf_counter() - state[0], request.method, route, response.status_code)
+            self.request_sql_statements.observe(state[1], route)
+            self.request_sql_duration.observe(state[2], route)
+        return response
+
+    # The start time lives on the statement's execution context rather than
+    # the connection, so a statement that fails (and never reaches
+    # after_cursor_execute) leaves nothing behind
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not self.enabled or context is None:
+            return
+        context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None or not self.enabled:
+            return
+        elapsed = time.perf_counter() - started
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+        self.sql_duration.observe(elapsed, operation)
+        if has_request_context():
+            state = g.get('_metrics')
+            if state is not None:
+                state[1] += 1
+                state[2] += elapsed
+
+    @contextmanager
+    def time_email_render(self, kind, mode, count=1):
+        if not self.enabled:
+            yield
+            return
+        # Timed inline rather than through Histogram.time: renders are short
+        # enough for a second generator frame to show
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.email_render_duration.observe(time.perf_counter() - start, kind, mode)
+        self.emails_rendered.inc(kind, amount=count)
+
+    @contextmanager
+    def time_email_send(self, backend):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            self.email_send_duration.observe(time.perf_counter() - start, backend, outcome)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for family in self.families:
+            lines.append(f'# HELP {family.name} {family.documentation}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            lines.extend(family.samples())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
@@ -0,0 +1,176 @@
+import math
+import re
+from functools import lru_cache
+
+# Service area zones: (latitude, longitude, keywords matched in location strings)
+ZONES = {
+    'dfw_airport': (32.8998, -97.0403, ['dfw', 'dallas fort worth airport', 'dallas/fort worth airport']),
+    'love_field': (32.8471, -96.8518, ['love field', 'dal airport']),
+    'downtown_dallas': (32.7767, -96.7970, ['downtown dallas', 'dallas downtown', 'deep ellum', 'dallas']),
+    'uptown_dallas': (32.8021, -96.8003, ['uptown', 'oak lawn', 'highland park']),
+    'fort_worth': (32.7555, -97.3308, ['fort worth', 'ft worth', 'stockyards']),
+    'arlington': (32.7357, -97.1081, ['arlington', 'at&t stadium', 'six flags']),
+    'irving': (32.8140, -96.9489, ['irving', 'las colinas']),
+    'grapevine': (32.9343, -97.0781, ['grapevine', 'southlake', 'colleyville']),
+    'plano': (33.0198, -96.6989, ['plano', 'legacy west']),
+    'frisco': (33.1507, -96.8236, ['frisco', 'the star']),
+    'richardson': (32.9483, -96.7299, ['richardson']),
+    'garland': (32.9126, -96.6389, ['garland', 'rowlett']),
+    'mckinney': (33.1972, -96.6398, ['mckinney', 'allen']),
+    'denton': (33.2148, -97.1331, ['denton', 'lewisville', 'flower mound']),
+}
+
+ZONE_NAMES = list(ZONES)
+ZONE_INDEX = {name: index for index, name in enumerate(ZONE_NAMES)}
+
+# Longest keywords first, so 'fort worth' wins over a bare 'dallas' in
+# 'Dallas/Fort Worth Airport' style strings
+KEYWORDS = sorted(
+    ((keyword, zone) for zone, (_, _, keywords) in ZONES.items() for keyword in keywords),
+    key=lambda item: -len(item[0])
+)
+
+ROAD_FACTOR = 1.3  # driving distance vs straight line
+SAME_ZONE_MILES = 6.0
+UNKNOWN_ZONE_MILES = 18.0
+AVERAGE_SPEED_MPH = 30.0
+
+
+def _haversine_miles(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 3958.8 * math.asin(math.sqrt(h))
+
+
+def _build_distance_matrix():
+    matrix = []
+    for origin in ZONE_NAMES:
+        row = []
+        for destination in ZONE_NAMES:
+            if origin == destination:
+                row.append(SAME_ZONE_MILES)
+            else:
+                row.append(round(_haversine_miles(ZONES[origin], ZONES[destination]) * ROAD_FACTOR, 1))
+        matrix.append(row)
+    return matrix
+
+
+# Zone-to-zone driving miles, computed once at import
+DISTANCE_MATRIX = _build_distance_matrix()
+
+SERVICE_RATES = {
+    'airport_transfer': {'base': 45.0, 'per_mile': 2.75},
+    'point_to_point': {'base': 35.0, 'per_mile': 2.50},
+    'corporate': {'base': 50.0, 'per_mile': 2.90},
+    'wedding': {'base': 95.0, 'per_mile': 3.25},
+    'hourly': {'base': 0.0, 'per_mile': 0.0, 'per_hour': 75.0, 'min_hours': 2},
+}
+DEFAULT_SERVICE_RATE = SERVICE_RATES['point_to_point']
+
+VEHICLE_MULTIPLIERS = {
+    'standard': 1.0,
+    'luxury_sedan': 1.35,
+    'suv': 1.5,
+    'van': 1.7,
+    'sprinter': 2.0,
+}
+
+INCLUDED_PASSENGERS = 4
+EXTRA_PASSENGER_FEE = 5.0
+RETURN_TRIP_FACTOR = 0.9  # second leg at 10% off
+WAITING_TIME_FEE = 30.0
+MEET_GREET_FEE = 25.0
+MINIMUM_FARE = 40.0
+
+
+@lru_cache(maxsize=4096)
+def resolve_zone(location):
+    """Map a free-text location to a zone name, or None if it is outside the known zones"""
+    text = re.sub(r'\s+', ' ', (location or '').lower()).strip()
+    for keyword, zone in KEYWORDS:
+        if keyword in text:
+            return zone
+    return None
+
+
+def zone_distance(pickup_zone, dropoff_zone):
+    """Driving miles between two zones"""
+    if pickup_zone is None or dropoff_zone is None:
+        return UNKNOWN_ZONE_MILES
+    return DISTANCE_MATRIX[ZONE_INDEX[pickup_zone]][ZONE_INDEX[dropoff_zone]]
+
+
+def trip_distance(pickup_location, dropoff_location):
+    return zone_distance(resolve_zone(pickup_location), resolve_zone(dropoff_location))
+
+
+def trip_minutes(pickup_location, dropoff_location):
+    """Rough driving time of a trip, used for scheduling"""
+    return trip_distance(pickup_location, dropoff_location) / AVERAGE_SPEED_MPH * 60
+
+
+def quote(service_type, pickup_location, dropoff_location, vehicle_type='standard', passengers=1,
+          return_trip=False, waiting_time=False, meet_greet=False, hours=None):
+    """Price a single trip, returns a dict with the price and its breakdown"""
+    return quote_many([{
+        'service_type': service_type,
+        'pickup_location': pickup_location,
+        'dropoff_location': dropoff_location,
+        'vehicle_type': vehicle_type,
+        'passengers': passengers,
+        'return_trip': return_trip,
+        'waiting_time': waiting_time,
+        'meet_greet': meet_greet,
+        'hours': hours,
+    }])[0]
+
+
+def quote_many(trips):
+    """Price a list of trips in one pass.
+
+    Each distinct location string is resolved once for the whole batch and
+    every lookup after that is a plain table access, so pricing hundreds of
+    candidate trips costs little more than pricing one.
+    """
+    zones = {}
+    for trip in trips:
+        for key in ('pickup_location', 'dropoff_location'):
+            location = trip.get(key)
+            if location not in zones:
+                zones[location] = resolve_zone(location)
+
+    quotes = []
+    for trip in trips:
+        pickup_zone = zones[trip.get('pickup_location')]
+        dropoff_zone = zones[trip.get('dropoff_location')]
+        distance = zone_distance(pickup_zone, dropoff_zone)
+        rate = SERVICE_RATES.get(trip.get('service_type'), DEFAULT_SERVICE_RATE)
+        multiplier = VEHICLE_MULTIPLIERS.get(trip.get('vehicle_type') or 'standard', 1.0)
+
+        if 'per_hour' in rate:
+            hours = max(float(trip.get('hours') or 0), distance / AVERAGE_SPEED_MPH, rate['min_hours'])
+            fare = rate['per_hour'] * hours
+        else:
+            fare = rate['base'] + rate['per_mile'] * distance
+        fare *= multiplier
+
+        passengers = int(trip.get('passengers') or 1)
+        passenger_fee = max(passengers - INCLUDED_PASSENGERS, 0) * EXTRA_PASSENGER_FEE
+        return_fare = fare * RETURN_TRIP_FACTOR if trip.get('return_trip') else 0.0
+        extras = (WAITING_TIME_FEE if trip.get('waiting_time') else 0.0) + (MEET_GREET_FEE if trip.get('meet_greet') else 0.0)
+
+        price = max(fare + passenger_fee + return_fare + extras, MINIMUM_FARE)
+        quotes.append({
+            'price': round(price, 2),
+            'currency': 'USD',
+            'distance_miles': distance,
+            'pickup_zone': pickup_zone,
+            'dropoff_zone': dropoff_zone,
+            'breakdown': {
+                'fare': round(fare, 2),
+                'passengers': round(passenger_fee, 2),
+                'return_trip': round(return_fare, 2),
+                'extras': round(extras, 2),
+            }
+        })
+    return quotes
@@ -0,0 +1,211 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, insert, inspect, select, text
+from src.models.booking import db, Booking, BookingRollup
+from src.utils.archive import booking_archive
+from src.utils.database import upsert
+from src.utils.export import EXPORT_FIELDS
+
+ROLLUP_KEYS = ('day', 'status', 'service_type', 'vehicle_type')
+
+# Booking attributes a rollup row depends on, and the rollup column each one feeds
+TRACKED = {
+    'pickup_date': 'day',
+    'status': 'status',
+    'service_type': 'service_type',
+    'vehicle_type': 'vehicle_type',
+    'estimated_price': 'estimated_price',
+    'final_price': 'final_price',
+}
+
+
+def rollup_delta(values, sign):
+    """The change one booking (a dict of rollup fields) makes to its rollup row"""
+    return {
+        'day': values['day'],
+        'status': values['status'] or 'pending',
+        'service_type': values['service_type'],
+        'vehicle_type': values['vehicle_type'] or 'standard',
+        'bookings': sign,
+        'estimated_total': sign * (values['estimated_price'] or 0),
+        'final_total': sign * (values['final_price'] or 0),
+    }
+
+
+def booking_values(row):
+    """Rollup fields of a booking, from a model instance or a column value dict"""
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name, None)
+    return {field: get(attribute) for attribute, field in TRACKED.items()}
+
+
+class BookingRollups:
+    """Booking counts and revenue kept per (pickup day, status, service, vehicle).
+
+    Mapper events on Booking apply each insert, update and delete to the
+    rollup table in the same flush, so it is always as current as the
+    bookings themselves: a status change moves one booking from one row to
+    another. Writes that bypass the ORM unit of work (core INSERTs, bulk
+    UPDATEs of rollup columns) must go through add_rows, and rebuild
+    recounts everything from scratch (flask rollups rebuild). Archiving
+    deletes bookings without ORM events, so archived ones stay counted. The
+    dashboard reads only this table, whose size grows with days x
+    combinations rather than with bookings.
+    """
+
+    def __init__(self):
+        self._statements = {}
+
+    def init_app(self, app):
+        app.extensions['rollups'] = self
+        app.cli.add_command(rollups_cli)
+
+    def backfill(self):
+        """The table starts empty on an existing database, fill it in once (flask init-db)"""
+        if db.session.scalar(select(func.count()).select_from(BookingRollup)) == 0:
+            if db.session.scalar(select(func.count()).select_from(Booking)):
+                self.rebuild()
+
+    def apply(self, connection, deltas):
+        """Add rollup deltas (dicts from rollup_delta) on a connection"""
+        merged = {}
+        for delta in deltas:
+            key = tuple(delta[name] for name in ROLLUP_KEYS)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = dict(delta)
+            else:
+                for name in ('bookings', 'estimated_total', 'final_total'):
+                    current[name] += delta[name]
+        changes = [
+            delta for delta in merged.values()
+            if delta['bookings'] or delta['estimated_total'] or delta['final_total']
+        ]
+        if not changes:
+            return
+
+        connection.execute(self._upsert(connection.dialect.name), changes)
+
+    def _upsert(self, dialect_name):
+        # Built once per dialect, this runs in every flush that touches a booking
+        statement = self._statements.get(dialect_name)
+        if statement is None:
+            statement = upsert(BookingRollup, dialect_name)
+            statement = self._statements[dialect_name] = statement.on_conflict_do_update(
+                index_elements=list(ROLLUP_KEYS),
+                set_={
+                    'bookings': BookingRollup.bookings + statement.excluded.bookings,
+                    'estimated_total': BookingRollup.estimated_total + statement.excluded.estimated_total,
+                    'final_total': BookingRollup.final_total + statement.excluded.final_total,
+                }
+            )
+        return statement
+
+    def add_rows(self, rows):
+        """Count bookings written with a core INSERT, in the current transaction"""
+        self.apply(db.session.connection(), [rollup_delta(booking_values(row), 1) for row in rows])
+
+    def rebuild(self):
+        """Recount every rollup row from the bookings table and the archive, and commit"""
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Keep bookings from changing between the delete and the recount
+            db.session.execute(text(f'LOCK TABLE {Booking.__tablename__} IN SHARE MODE'))
+        status = func.coalesce(Booking.status, 'pending')
+        db.session.execute(delete(BookingRollup))
+        db.session.execute(insert(BookingRollup).from_select(
+            ['day', 'status', 'service_type', 'vehicle_type', 'bookings', 'estimated_total', 'final_total'],
+            select(
+                Booking.pickup_date, status, Booking.service_type, Booking.vehicle_type, func.count(),
+                func.coalesce(func.sum(Booking.estimated_price), 0),
+                func.coalesce(func.sum(Booking.final_price), 0)
+            ).group_by(Booking.pickup_date, status, Booking.service_type, Booking.vehicle_type)
+        ))
+        # Archived bookings are no longer in the table but still count
+        self.apply(db.session.connection(), (
+            rollup_delta(booking_values(dict(zip(EXPORT_FIELDS, row))), 1)
+            for row in booking_archive.iter_rows()
+        ))
+        db.session.commit()
+
+    def summary(self, session, group_by, conditions=()):
+        """Totals over the rollup rows matching conditions, grouped by some of ROLLUP_KEYS"""
+        columns = [getattr(BookingRollup, name) for name in group_by]
+        rows = session.execute(
+            select(
+                *columns,
+                func.sum(BookingRollup.bookings).label('bookings'),
+                func.sum(BookingRollup.estimated_total).label('estimated_total'),
+                func.sum(BookingRollup.final_total).label('final_total')
+            )
+            .where(*conditions)
+            .group_by(*columns)
+            .order_by(*columns)
+        )
+        groups = []
+        for row in rows:
+            if not row.bookings:
+                continue
+            group = {name: getattr(row, name) for name in group_by}
+            if 'day' in group:
+                group['day'] = group['day'].isoformat()
+            group.update(
+                bookings=row.bookings,
+                estimated_revenue=round(row.estimated_total or 0, 2),
+                final_revenue=round(row.final_total or 0, 2)
+            )
+            groups.append(group)
+        return groups
+
+
+booking_rollups = BookingRollups()
+
+rollups_cli = AppGroup('rollups', help='Booking rollups for the admin dashboard')
+
+
+@rollups_cli.command('rebuild')
+def rebuild_command():
+    """Recount the booking rollups from the bookings table"""
+    booking_rollups.rebuild()
+    count = db.session.scalar(select(func.count()).select_from(BookingRollup))
+    click.echo(f'Rebuilt {count} rollup rows')
+
+
+def _remember_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Load the old value when a tracked attribute is set, so after_update can
+# take the booking out of the row it used to count in
+for _attribute in TRACKED:
+    event.listen(getattr(Booking, _attribute), 'set', _remember_old_value, active_history=True)
+
+
+@event.listens_for(Booking, 'after_insert')
+def _booking_inserted(mapper, connection, target):
+    booking_rollups.apply(connection, [rollup_delta(booking_values(target), 1)])
+
+
+@event.listens_for(Booking, 'after_update')
+def _booking_updated(mapper, connection, target):
+    state = inspect(target)
+    old = {}
+    changed = False
+    for attribute, field in TRACKED.items():
+        history = state.attrs[attribute].history
+        if history.deleted:
+            old[field] = history.deleted[0]
+            changed = True
+        else:
+            old[field] = getattr(target, attribute)
+    if changed:
+        booking_rollups.apply(connection, [rollup_delta(old, -1), rollup_delta(booking_values(target), 1)])
+
+
+@event.listens_for(Booking, 'after_delete')
+def _booking_deleted(mapper, connection, target):
+    state = inspect(target)
+    old = booking_values(target)
+    for attribute, field in TRACKED.items():
+        history = state.attrs[attribute].history
+        if history.deleted:
+            old[field] = history.deleted[0]
+    booking_rollups.apply(connection, [rollup_delta(old, -1)])
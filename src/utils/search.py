@@ -0,0 +1,164 @@
+import os
+import re
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, or_, select, text
+from src.models.booking import db, Booking
+
+SEARCH_TABLE = 'booking_search'
+
+# Indexed columns and their bm25 weight: a hit on a name, email or phone
+# matters more than one on an address or in the special requests
+SEARCH_COLUMNS = {
+    'first_name': 10.0,
+    'last_name': 10.0,
+    'email': 8.0,
+    'phone': 8.0,
+    'pickup_location': 3.0,
+    'dropoff_location': 3.0,
+    'special_requests': 1.0,
+}
+
+TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    """The words of a free-text query, lowercased; punctuation only separates them"""
+    return [term.lower() for term in TERM.findall(query or '')]
+
+
+def match_expression(terms):
+    """FTS5 query matching rows with a word starting with each of the terms.
+
+    Each term is quoted so input can never be read as FTS5 syntax.
+    """
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class BookingSearch:
+    """Full-text search over customer and trip fields of bookings.
+
+    On SQLite the fields are indexed in an external-content FTS5 table (the
+    text itself stays in booking) with a prefix index, kept in sync by
+    triggers, so rows written with core INSERTs or straight through the
+    DB-API are indexed too. Matches are ranked with bm25; scoring costs
+    something per match, so when a query matches more than rank_window
+    bookings only the newest rank_window of them (found by walking the index
+    backwards by id, which scores nothing) are ranked. Other databases fall
+    back to case-insensitive LIKE over the same columns, unranked.
+    """
+
+    def __init__(self, rank_window=None):
+        self.rank_window = rank_window if rank_window is not None else int(os.getenv('SEARCH_RANK_WINDOW', '1000'))
+        self.available = None  # unknown until the first search
+
+    def init_app(self, app):
+        app.extensions['search'] = self
+        app.cli.add_command(search_cli)
+
+    def backfill(self):
+        """Create and fill the index if it is missing (flask init-db)"""
+        if db.engine.dialect.name != 'sqlite':
+            return
+        if not self._index_exists():
+            self.create()
+            self.rebuild()
+        self.available = True
+
+    def is_available(self):
+        """Whether searches can use the index; a missing index is looked for
+        again on every search, until flask init-db has created it"""
+        if self.available is None:
+            if db.engine.dialect.name != 'sqlite':
+                self.available = False
+            elif self._index_exists():
+                self.available = True
+        return bool(self.available)
+
+    def _index_exists(self):
+        return bool(db.session.scalar(
+            text("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': SEARCH_TABLE}
+        ))
+
+    def create(self):
+        """Create the FTS5 table and the triggers that keep it in sync"""
+        columns = ', '.join(SEARCH_COLUMNS)
+        new = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+        old = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+        table = Booking.__tablename__
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            f"{columns}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')",
+            f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES (new.id, {new}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF {columns} ON {table} BEGIN "
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES (new.id, {new}); END",
+        ]
+        for statement in statements:
+            db.session.execute(text(statement))
+        db.session.commit()
+
+    def rebuild(self):
+        """Reindex every booking, and commit"""
+        db.session.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+        db.session.commit()
+
+    def search(self, session, query, limit, offset=0):
+        """Bookings matching every word of query, best match first"""
+        terms = search_terms(query)
+        if not terms:
+            return []
+        if not self.is_available():
+            return self._search_like(session, terms, limit, offset)
+
+        match = match_expression(terms)
+        cutoff = 0
+        if self.rank_window > 0:
+            cutoff = session.scalar(text(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+                f"ORDER BY rowid DESC LIMIT 1 OFFSET :window"
+            ), {'match': match, 'window': self.rank_window - 1}) or 0
+
+        # Rank and page in the subquery, so only one page of bookings is read
+        weights = ', '.join(str(weight) for weight in SEARCH_COLUMNS.values())
+        table = Booking.__tablename__
+        statement = text(
+            f"SELECT {table}.* FROM ("
+            f"SELECT rowid, bm25({SEARCH_TABLE}, {weights}) AS score FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH :match AND rowid >= :cutoff "
+            f"ORDER BY score, rowid DESC LIMIT :limit OFFSET :offset"
+            f") AS hits JOIN {table} ON {table}.id = hits.rowid "
+            f"ORDER BY hits.score, hits.rowid DESC"
+        ).bindparams(match=match, cutoff=cutoff, limit=limit, offset=offset)
+        return session.scalars(select(Booking).from_statement(statement)).all()
+
+    def _search_like(self, session, terms, limit, offset):
+        columns = [getattr(Booking, column) for column in SEARCH_COLUMNS]
+        conditions = [
+            or_(*(func.lower(column).contains(term, autoescape=True) for column in columns))
+            for term in terms
+        ]
+        return session.scalars(
+            select(Booking).where(*conditions).order_by(Booking.id.desc()).limit(limit).offset(offset)
+        ).all()
+
+
+booking_search = BookingSearch()
+
+search_cli = AppGroup('search', help='Full-text booking search')
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Reindex every booking for search"""
+    if db.engine.dialect.name != 'sqlite':
+        click.echo('Full-text search needs SQLite, other databases search with LIKE')
+        return
+    booking_search.create()
+    booking_search.rebuild()
+    click.echo('Search index rebuilt')
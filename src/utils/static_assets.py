@@ -0,0 +1,164 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from email.utils import formatdate
+from flask import Response, request, send_file
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+# index-3f9a1c2b.js, main.8d2e4f01.css, chunk-BxQ3ab12.js, ...
+HASHED_NAME = re.compile(r'[.-](?=[A-Za-z0-9_]*\d)[A-Za-z0-9_]{8,}\.\w+$')
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/javascript', 'application/json', 'application/xml',
+    'image/svg+xml', 'application/wasm', 'application/manifest+json',
+)
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+class StaticAsset:
+    """One file of the static folder, with its precompressed variants"""
+
+    def __init__(self, path, relative_path, body, mimetype, mtime, max_memory_size):
+        self.path = path
+        self.size = len(body)
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.cache_control = IMMUTABLE if HASHED_NAME.search(relative_path) else REVALIDATE
+        # Large files are streamed from disk instead of being kept in memory
+        self.body = body if self.size <= max_memory_size else None
+        self.variants = {}
+
+    def add_variant(self, encoding, body):
+        # Only worth serving when it is actually smaller
+        if len(body) < self.size:
+            self.variants[encoding] = body
+
+
+class StaticAssets:
+    """Manifest of the static folder, listed on the first request.
+
+    The first request for a file reads it, fingerprints it (ETag) and, for
+    text-like types, compresses it with gzip and brotli (if the brotli package
+    is installed); .gz/.br files shipped next to an asset are used as is.
+    Later requests are answered from memory: conditional requests get a 304,
+    hashed file names get immutable caching and index.html is served for SPA
+    routes. Worker startup does not touch the folder at all.
+    """
+
+    def __init__(self, folder=None, max_memory_size=1024 * 1024):
+        self.folder = folder
+        self.max_memory_size = max_memory_size
+        self.paths = None  # relative path -> file path
+        self.assets = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.folder = self.folder or app.static_folder
+        app.extensions['static_assets'] = self
+
+    def scan(self):
+        """List the files of the static folder, each is loaded when first requested"""
+        paths = {}
+        if self.folder and os.path.isdir(self.folder):
+            for root, _, files in os.walk(self.folder):
+                for name in files:
+                    if name.endswith(('.gz', '.br')):
+                        continue
+                    path = os.path.join(root, name)
+                    relative_path = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                    paths[relative_path] = path
+        self.assets = {}
+        self.paths = paths
+
+    def _load(self, path, relative_path):
+        with open(path, 'rb') as f:
+            body = f.read()
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        asset = StaticAsset(path, relative_path, body, mimetype, os.path.getmtime(path), self.max_memory_size)
+        if asset.body is None:
+            return asset
+
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if os.path.exists(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    asset.add_variant(encoding, f.read())
+
+        if mimetype.startswith(COMPRESSIBLE_TYPES):
+            if 'gzip' not in asset.variants:
+                asset.add_variant('gzip', gzip.compress(body, compresslevel=9, mtime=0))
+            if 'br' not in asset.variants and brotli is not None:
+                asset.add_variant('br', brotli.compress(body))
+        return asset
+
+    def get(self, path):
+        asset = self.assets.get(path)
+        if asset is not None:
+            return asset
+        with self._lock:
+            if self.paths is None:
+                self.scan()
+            file_path = self.paths.get(path)
+            if file_path is None:
+                return None
+            asset = self.assets.get(path)
+            if asset is None:
+                asset = self.assets[path] = self._load(file_path, path)
+            return asset
+
+    @property
+    def index(self):
+        return self.get('index.html')
+
+    def respond(self, asset):
+        """Serve an asset for the current request"""
+        if asset.body is None:
+            response = send_file(asset.path, mimetype=asset.mimetype, etag=asset.etag, conditional=True)
+            response.headers['Cache-Control'] = asset.cache_control
+            return response
+
+        encoding = self._negotiate(asset)
+        etag = f'{asset.etag}-{encoding}' if encoding else asset.etag
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': asset.cache_control,
+            'Last-Modified': asset.last_modified,
+        }
+        if asset.variants:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if self._not_modified(asset):
+            return Response(status=304, headers=headers)
+
+        body = asset.variants[encoding] if encoding else asset.body
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(body, mimetype=asset.mimetype, headers=headers)
+
+    def _negotiate(self, asset):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.variants and accepted[encoding] > 0:
+                return encoding
+        return None
+
+    def _not_modified(self, asset):
+        if_none_match = request.if_none_match
+        if not if_none_match:
+            return False
+        if if_none_match.star_tag:
+            return True
+        # Any encoding of the same content is still current
+        return any(tag.split('-')[0] == asset.etag for tag in if_none_match.as_set(include_weak=True))
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,17 @@
+"""WSGI entry point for a preforking server.
+
+    gunicorn -c gunicorn.conf.py src.wsgi:app
+
+See gunicorn.conf.py for the worker settings; src/main.py's app.run() is
+only the development server. Run "flask --app src.main init-db" and
+"flask --app src.main seed" once per deploy, before starting the workers.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import create_app, start_background_workers
+
+app = create_app()
+start_background_workers()